@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import toggl_stub
+from entry_store import LOCAL_TZ, EntryStore, buckets, local_keys
+from time_entries import TimeEntries
+
+# Aggregation over 50k synthetic entries: the old path that parsed start and
+# stop of every entry and converted each start with astimezone, against the
+# duration-based path with cached offsets
+
+DAYS = 8400
+PER_DAY = 12
+ROUNDS = 3
+
+def parse_ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def total_minutes_parsed(entries):
+    total = 0
+    for e in entries:
+        if e.get("stop") and e.get("start"):
+            start = parse_ts(e["start"])
+            stop = parse_ts(e["stop"])
+            total += int((stop - start).total_seconds() / 60)
+    return total
+
+def total_minutes_duration(entries):
+    return sum(e["duration"] // 60 for e in entries if e.get("stop") and e.get("start"))
+
+def buckets_parsed(entries):
+    rows = []
+    for e in entries:
+        local = parse_ts(e["start"]).astimezone(LOCAL_TZ)
+        year, week, _ = local.isocalendar()
+        rows.append((local.date().isoformat(), f"{year}-W{week:02}"))
+    return rows
+
+def buckets_cached(entries):
+    return [buckets(int(parse_ts(e["start"]).timestamp())) for e in entries]
+
+def upsert(entries):
+    store = EntryStore(":memory:")
+    store.upsert(entries)
+    return store.minutes_since(datetime(1970, 1, 1, tzinfo=LOCAL_TZ))
+
+def best_of(fn, entries):
+    best = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = fn(entries)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+if __name__ == "__main__":
+    entries = toggl_stub.make_entries(DAYS, PER_DAY)
+    print(f"{len(entries)} entries")
+    for name, old, new in (
+        ("total_minutes", total_minutes_parsed, total_minutes_duration),
+        ("day/week buckets", buckets_parsed, buckets_cached),
+    ):
+        old_s, old_result = best_of(old, entries)
+        new_s, new_result = best_of(new, entries)
+        assert old_result == new_result, name
+        print(f"{name}: {old_s * 1000:.0f} ms -> {new_s * 1000:.0f} ms ({old_s / new_s:.1f}x)")
+
+    build_s, batch = best_of(TimeEntries.from_json, entries)
+    columnar_s, columnar_total = best_of(TimeEntries.total_minutes, batch)
+    assert columnar_total == total_minutes_parsed(entries)
+    print(f"TimeEntries.from_json: {build_s * 1000:.0f} ms, total_minutes over it: {columnar_s * 1000:.2f} ms")
+
+    keys_s, keys = best_of(local_keys, batch.start)
+    assert keys == buckets_cached(entries)
+    print(f"day/week buckets over the Calendar (searchsorted): {keys_s * 1000:.0f} ms")
+
+    upsert_s, _ = best_of(upsert, entries)
+    print(f"store upsert + total: {upsert_s * 1000:.0f} ms")
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import toggl_stub
+from toggl_client import RateLimiter, TogglClient
+
+# Serial vs. concurrent download of a year of history in 30-day chunks
+# against the local stub, with a fixed per-request latency. Pages are kept
+# small so every chunk takes several requests.
+
+DAYS = 365
+CHUNK_DAYS = 30
+LATENCY_S = 0.2
+ROUNDS = 3
+PAGE_SIZE = 40
+
+def bench(base_url, workers):
+    # Unthrottled limiter on a private state file, only the transfer is timed
+    limiter = RateLimiter(rate_per_s=1000, burst=1000, path=os.path.join(tempfile.mkdtemp(), "rate_limit.json"))
+    client = TogglClient(base_url, "stub", CHUNK_DAYS, max_workers=workers, limiter=limiter, page_size=PAGE_SIZE)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=DAYS)
+    best = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        entries = client.time_entries(start, end)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(entries)
+
+if __name__ == "__main__":
+    server = toggl_stub.serve(toggl_stub.make_entries(DAYS), latency_s=LATENCY_S, page_size=PAGE_SIZE)
+    print(f"{len(server.entries)} entries, {DAYS // CHUNK_DAYS + 1} chunks of {PAGE_SIZE}-entry pages, {LATENCY_S * 1000:.0f} ms latency")
+    for workers in (1, 2, 4, 8):
+        requests_before = server.requests
+        elapsed, count = bench(server.base_url, workers)
+        assert count == len(server.entries), f"reassembled {count} of {len(server.entries)} entries"
+        print(f"workers={workers}: {elapsed:.2f}s ({count} entries, {(server.requests - requests_before) // ROUNDS} requests)")
+    server.shutdown()
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# End-to-end refresh of the dashboard aggregates against the local stub:
+# the real client, rate limiter and store, configured from config.yaml with
+# TOGGL_BASE_URL pointing at the stub. A cold refresh downloads the whole
+# history, the warm one after it is the incremental sync every run does.
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["TOGGL_RATE_LIMIT_STATE"] = os.path.join(TMP_DIR, "rate_limit.json")
+os.environ["TOGGL_API_TOKEN"] = "stub"
+
+import toggl
+import toggl_stub
+from entry_store import LOCAL_TZ, EntryStore
+from settings import get_settings
+
+LATENCY_S = 0.05
+SCENARIOS = (
+    ("no errors", 0),
+    ("every 4th request 429", 4),
+)
+
+def reset(name):
+    # Fresh store, caches and request budget per scenario
+    toggl._client = None
+    toggl._local.store = EntryStore(os.path.join(TMP_DIR, f"{name}.sqlite"))
+    toggl.AGGREGATES_CACHE_PATH = os.path.join(TMP_DIR, f"{name}_aggregates.json")
+    toggl.BEST_CACHE_PATH = os.path.join(TMP_DIR, f"{name}_best.json")
+    if os.path.exists(os.environ["TOGGL_RATE_LIMIT_STATE"]):
+        os.remove(os.environ["TOGGL_RATE_LIMIT_STATE"])
+
+def timed(server):
+    requests_before = server.requests
+    started = time.perf_counter()
+    data = toggl.refresh_aggregates()
+    return time.perf_counter() - started, server.requests - requests_before, data
+
+if __name__ == "__main__":
+    days = (datetime.now(LOCAL_TZ) - toggl.TRACKING_START_DATE).days + 30
+    entries = toggl_stub.make_entries(days)
+    max_range_days = get_settings().max_date_range_days
+    print(f"{len(entries)} entries over {days} days, {max_range_days}-day ranges, {LATENCY_S * 1000:.0f} ms latency")
+
+    for name, fail_every in SCENARIOS:
+        server = toggl_stub.serve(entries, LATENCY_S, max_range_days=max_range_days, fail_every=fail_every)
+        os.environ["TOGGL_BASE_URL"] = server.base_url
+        get_settings.cache_clear()
+        reset(name.replace(" ", "_"))
+
+        cold_s, cold_requests, data = timed(server)
+        warm_s, warm_requests, _ = timed(server)
+        print(f"{name}: cold {cold_s:.2f}s ({cold_requests} requests), "
+              f"warm {warm_s * 1000:.0f} ms ({warm_requests} requests), total {data['total']} min")
+        server.shutdown()
@@ -0,0 +1,43 @@
+from PIL import Image, ImageDraw
+
+class PortraitCanvas:
+    """Portrait drawing surface backed by the panel's native landscape image.
+
+    Drawing calls take portrait coordinates and are mapped onto `image`, so
+    getbuffer() can pack the frame as-is instead of rotating it every update.
+    """
+
+    def __init__(self, width, height, fill=255):
+        self.width = width
+        self.height = height
+        self.image = Image.new('1', (height, width), fill)
+        self.draw = ImageDraw.Draw(self.image)
+
+    def box(self, x0, y0, x1, y1):
+        # Rotating portrait by 90 degrees maps (x, y) to (y, width - 1 - x)
+        return [y0, self.width - 1 - x1, y1, self.width - 1 - x0]
+
+    def rectangle(self, xy, fill=None, outline=None):
+        x0, y0, x1, y1 = xy
+        self.draw.rectangle(self.box(x0, y0, x1, y1), fill=fill, outline=outline)
+
+    def text(self, xy, text, font, fill=0):
+        # Only the small text patch is rotated, never the whole frame
+        x, y = xy
+        left, top, right, bottom = font.getbbox(text)
+        if right <= left or bottom <= top:
+            return
+        # Rendered glyphs can reach a few pixels past the reported box on
+        # any side (negative bearings, hinting), so draw with a margin and
+        # keep only the inked part
+        pad = (bottom - top) // 2 + 2
+        mask = Image.new('1', (right - left + 2 * pad, bottom - top + 2 * pad), 0)
+        ImageDraw.Draw(mask).text((pad - left, pad - top), text, font=font, fill=1)
+        ink = mask.getbbox()
+        if ink is None:
+            return
+        mask = mask.crop(ink)
+        x0 = x + left - pad + ink[0]
+        y0 = y + top - pad + ink[1]
+        mask = mask.transpose(Image.Transpose.ROTATE_90)
+        self.image.paste(fill, (y0, self.width - x0 - (ink[2] - ink[0])), mask)
@@ -1,7 +1,14 @@
-from PIL import Image, ImageDraw, ImageFont
+import argparse
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
 import time
-import epd7in5_V2
+from functools import lru_cache
 import toggl
+from toggl_client import TogglError
 
 DAILY_GOAL_MIN = 390
 WEEKLY_GOAL_MIN = DAILY_GOAL_MIN * 5
@@ -16,10 +23,47 @@ SECTION_SPACING = 36
 BAR_WIDTH = 100
 BAR_HEIGHT = 14
 
+# Portrait box (x0, y0, x1, y1) of the "Today" bar, redrawn on its own in live mode
+TODAY_BAR_BOX = (X_MARGIN + 80, Y_MARGIN + LINE_HEIGHT + 6, X_MARGIN + 80 + BAR_WIDTH, Y_MARGIN + LINE_HEIGHT + 6 + BAR_HEIGHT)
+
+# Daemon Constants
+UPDATE_INTERVAL_S = 300
+LIVE_INTERVAL_S = 60
+CLEANSE_INTERVAL_S = 3600
+# A running timer is extrapolated locally and asked about again after this
+TIMER_RECHECK_S = 900
+# Every refresh logs the quota headroom, below this it's also a warning
+QUOTA_WARN_REMAINING = 20
+# Longest wait for fresh aggregates before rendering the cached ones in
+# daemon and live mode; one-shot runs render the cache right away
+REFRESH_WAIT_S = 5
+# Aggregates older than this get an "as of" marker
+STALE_AFTER_S = 900
+
+# Typical refresh power of the 7.5" V2 panel from the Waveshare datasheet,
+# used to estimate the energy spent per update
+REFRESH_POWER_MW = 26.4
+
+# Hash of the render inputs of the frame on the panel, lets a cron run that
+# would draw the same frame exit before loading PIL or the panel driver
+LAST_FRAME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "last_frame.hash")
+
 # Fonts
 font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-font = ImageFont.truetype(font_path, 22)
-font_bold = ImageFont.truetype(font_path, 26)
+
+@lru_cache(maxsize=None)
+def load_fonts():
+    from PIL import ImageFont
+    return (
+        ImageFont.truetype(font_path, 22),
+        ImageFont.truetype(font_path, 26),
+        ImageFont.truetype(font_path, 14),
+    )
+
+def load_epd():
+    # The driver pulls in the GPIO/SPI stack, only paid for when the panel is updated
+    import epd7in5_V2
+    return epd7in5_V2.EPD()
 
 # Utilities
 def minutes_to_str(mins):
@@ -36,57 +80,325 @@ def draw_bar(draw, x, y, value, goal):
     draw.rectangle([x, y, x + BAR_WIDTH, y + BAR_HEIGHT], outline=0)
     draw.rectangle([x, y, x + fill_width, y + BAR_HEIGHT], fill=0)
 
-# Init display
-epd = epd7in5_V2.EPD()
-epd.init()
-epd.Clear()
-
-image = Image.new('1', (WIDTH, HEIGHT), 255)
-draw = ImageDraw.Draw(image)
-
-# Get data
-data = toggl.get_productivity_data()
-total_debt = toggl.get_total_debt()
-
-today = data['today']
-yesterday = data['yesterday']
-best_day = data['best_day']
-this_week = data['this_week']
-last_week = data['last_week']
-best_week = data['best_week']
-debt_today = max(0, DAILY_GOAL_MIN - today)
-
-# Draw section headers
-y = Y_MARGIN
-draw.text((X_MARGIN, y), "DAILY", font=font_bold, fill=0)
-draw.text((X_MARGIN + COL_SPACING, y), "WEEKLY", font=font_bold, fill=0)
-y += LINE_HEIGHT + 4
-
-# Today & This Week bar
-draw.text((X_MARGIN, y), "Today:", font=font, fill=0)
-draw_bar(draw, X_MARGIN + 80, y + 2, today, DAILY_GOAL_MIN)
-draw.text((X_MARGIN + COL_SPACING, y), "This Week:", font=font, fill=0)
-draw_bar(draw, X_MARGIN + COL_SPACING + 130, y + 2, this_week, WEEKLY_GOAL_MIN)
-y += BAR_HEIGHT + 8
-
-# Other values
-draw.text((X_MARGIN, y), f"Yest : {minutes_to_str(yesterday)}", font=font, fill=0)
-draw.text((X_MARGIN + COL_SPACING, y), f"Last Week: {minutes_to_str(last_week)}", font=font, fill=0)
-y += LINE_HEIGHT
-
-draw.text((X_MARGIN, y), f"Best : {format_best(best_day)}", font=font, fill=0)
-# draw.text((X_MARGIN + COL_SPACING, y), f"Best Week: {format_best(best_week)}", font=font, fill=0)
-y += SECTION_SPACING
-
-# Debt
-draw.text((X_MARGIN, y), "DEBT", font=font_bold, fill=0)
-y += LINE_HEIGHT + 4
-draw.text((X_MARGIN, y), f"Owed Today: {minutes_to_str(debt_today)}", font=font, fill=0)
-y += LINE_HEIGHT
-draw.text((X_MARGIN, y), f"Since Apr 9: {minutes_to_str(total_debt)}", font=font, fill=0)
-
-# Show image
-epd.display(epd.getbuffer(image))
-epd.sleep()
-print(f"[{time.ctime()}] Dashboard updated successfully.")
+def stale_marker(fetched_at):
+    if fetched_at is None or time.time() - fetched_at < STALE_AFTER_S:
+        return None
+    fetched = time.localtime(fetched_at)
+    if time.strftime("%Y-%m-%d", fetched) == time.strftime("%Y-%m-%d"):
+        return time.strftime("as of %H:%M", fetched)
+    return time.strftime("as of %d %b %H:%M", fetched)
+
+def render(data, total_debt, fetched_at=None):
+    # Drawn in portrait coordinates straight into the panel's landscape frame
+    from canvas import PortraitCanvas
+    draw = PortraitCanvas(WIDTH, HEIGHT)
+    font, font_bold, font_small = load_fonts()
+
+    today = data['today']
+    yesterday = data['yesterday']
+    best_day = data['best_day']
+    this_week = data['this_week']
+    last_week = data['last_week']
+    best_week = data['best_week']
+    debt_today = max(0, DAILY_GOAL_MIN - today)
+
+    # Draw section headers
+    y = Y_MARGIN
+    draw.text((X_MARGIN, y), "DAILY", font=font_bold, fill=0)
+    draw.text((X_MARGIN + COL_SPACING, y), "WEEKLY", font=font_bold, fill=0)
+    y += LINE_HEIGHT + 4
+
+    # Today & This Week bar
+    draw.text((X_MARGIN, y), "Today:", font=font, fill=0)
+    draw_bar(draw, X_MARGIN + 80, y + 2, today, DAILY_GOAL_MIN)
+    draw.text((X_MARGIN + COL_SPACING, y), "This Week:", font=font, fill=0)
+    draw_bar(draw, X_MARGIN + COL_SPACING + 130, y + 2, this_week, WEEKLY_GOAL_MIN)
+    y += BAR_HEIGHT + 8
+
+    # Other values
+    draw.text((X_MARGIN, y), f"Yest : {minutes_to_str(yesterday)}", font=font, fill=0)
+    draw.text((X_MARGIN + COL_SPACING, y), f"Last Week: {minutes_to_str(last_week)}", font=font, fill=0)
+    y += LINE_HEIGHT
+
+    draw.text((X_MARGIN, y), f"Best : {format_best(best_day)}", font=font, fill=0)
+    # draw.text((X_MARGIN + COL_SPACING, y), f"Best Week: {format_best(best_week)}", font=font, fill=0)
+    y += SECTION_SPACING
+
+    # Debt
+    draw.text((X_MARGIN, y), "DEBT", font=font_bold, fill=0)
+    y += LINE_HEIGHT + 4
+    draw.text((X_MARGIN, y), f"Owed Today: {minutes_to_str(debt_today)}", font=font, fill=0)
+    y += LINE_HEIGHT
+    draw.text((X_MARGIN, y), f"Since Apr 9: {minutes_to_str(total_debt)}", font=font, fill=0)
+
+    # Subtle hint in the bottom corner when the API hasn't answered for a while
+    marker = stale_marker(fetched_at)
+    if marker:
+        right = font_small.getbbox(marker)[2]
+        draw.text((WIDTH - X_MARGIN - right, HEIGHT - Y_MARGIN), marker, font=font_small, fill=0)
+
+    return draw.image
+
+def to_panel_box(box):
+    # Portrait (x, y) lands on panel (y, WIDTH - 1 - x); the end is exclusive
+    x0, y0, x1, y1 = box
+    return y0, WIDTH - 1 - x1, y1 + 1, WIDTH - x0
+
+def warn_if_quota_low():
+    headroom = toggl.get_quota_headroom()
+    if headroom["quota_remaining"] is not None and headroom["quota_remaining"] <= QUOTA_WARN_REMAINING:
+        print(f"[{time.ctime()}] ⚠️ Toggl quota low: {headroom['quota_remaining']} requests left, "
+              f"resets in {headroom['quota_resets_in_s']}s")
+
+def fetch_frame_inputs(wait_s=REFRESH_WAIT_S, fresh_s=toggl.CACHE_FRESH_S, detached=False):
+    data, fetched_at = toggl.get_cached_productivity_data(wait_s, fresh_s, detached)
+    total_debt = toggl.get_total_debt(data["total"])
+    # Today includes the running timer in every mode. One-shot (detached)
+    # runs don't wait on the API and extrapolate the refresh's timer check.
+    timer = data.pop("timer", None)
+    if detached:
+        data["today"] = toggl.extrapolate_today(data["today"], timer, time.time())
+    else:
+        data["today"] = toggl.get_today_minutes(TIMER_RECHECK_S, timer)
+    warn_if_quota_low()
+    return data, total_debt, fetched_at
+
+def build_frame():
+    return render(*fetch_frame_inputs())
+
+def frame_key(data, total_debt, fetched_at):
+    # Covers everything render() draws, equal keys mean identical frames
+    payload = json.dumps([data, total_debt, stale_marker(fetched_at)], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def load_frame_key():
+    try:
+        with open(LAST_FRAME_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def save_frame_key(key):
+    with open(LAST_FRAME_PATH, "w") as f:
+        f.write(key)
+
+def run_once(interval):
+    # Renders the cached aggregates without waiting on the network. A cache
+    # older than half the run interval is refreshed for the next run in a
+    # detached process, so the run itself exits right away whether or not
+    # the frame changed. A failed first fetch (no cache yet) leaves the
+    # previous frame up.
+    try:
+        inputs = fetch_frame_inputs(wait_s=0, fresh_s=interval / 2, detached=True)
+    except TogglError as e:
+        print(f"[{time.ctime()}] ⚠️ Toggl unavailable ({e}), keeping the previous frame.")
+        sys.exit(1)
+
+    key = frame_key(*inputs)
+    if key == load_frame_key():
+        print(f"[{time.ctime()}] Frame unchanged, skipping refresh.")
+    else:
+        image = render(*inputs)
+        epd = load_epd()
+        epd.init()
+        epd.Clear()
+
+        epd.display(epd.getbuffer(image))
+        epd.sleep()
+        save_frame_key(key)
+        print(f"[{time.ctime()}] Dashboard updated successfully.")
+
+def profile_startup(top=15):
+    # Re-runs the imports of a cron invocation under -X importtime in a fresh
+    # interpreter and lists the most expensive modules
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import dashboard"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else f"exit code {result.returncode}")
+
+    print(f"{'self ms':>8} {'cumul ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{self_us / 1000:8.1f} {cumulative_us / 1000:9.1f}  {name}")
+    print(f"Total: {sum(row[0] for row in rows) / 1000:.1f} ms across {len(rows)} modules")
+
+class Panel:
+    """Keeps the display initialized between updates in daemon mode."""
+
+    def __init__(self):
+        self.epd = load_epd()
+        self.previous_image = None
+        self.last_cleanse = None
+        self.needs_init = True
+
+    def report(self, kind, started):
+        elapsed = time.monotonic() - started
+        print(f"[{time.ctime()}] {kind} refresh took {elapsed:.2f}s (~{elapsed * REFRESH_POWER_MW:.0f} mJ).")
+
+    def cleanse_due(self):
+        return self.last_cleanse is None or time.monotonic() - self.last_cleanse >= CLEANSE_INTERVAL_S
+
+    def update(self, image):
+        if self.previous_image is not None and image.tobytes() == self.previous_image.tobytes():
+            print(f"[{time.ctime()}] Frame unchanged, skipping refresh.")
+            return False
+
+        started = time.monotonic()
+        if self.needs_init or self.cleanse_due():
+            # Full init and clear once an hour to get rid of ghosting
+            self.epd.init()
+            self.epd.Clear()
+            self.last_cleanse = started
+            self.needs_init = False
+        else:
+            # Registers survive power_off(), so powering back on is the cheapest wake
+            self.epd.power_on()
+
+        self.epd.display(self.epd.getbuffer(image))
+        self.epd.power_off()
+        self.previous_image = image
+        self.report("Full", started)
+        return True
+
+    def update_partial(self, image, box):
+        panel_box = to_panel_box(box)
+        region = image.crop(panel_box)
+        if region.tobytes() == self.previous_image.crop(panel_box).tobytes():
+            return False
+
+        started = time.monotonic()
+        self.epd.init_fast()
+        self.epd.display_Partial_frame(self.epd.getbuffer(image), *panel_box)
+        self.epd.power_off()
+        # Partial mode leaves the panel settings changed, so the next full update re-inits
+        self.needs_init = True
+        # Only the box changed on the panel, keep the rest of the previous frame
+        self.previous_image = self.previous_image.copy()
+        self.previous_image.paste(region, panel_box[:2])
+        self.report("Live", started)
+        return True
+
+    def close(self):
+        if self.last_cleanse is not None:
+            self.epd.sleep()
+
+def run_daemon(interval):
+    # Turn SIGTERM into a normal exit so the panel is put to sleep on shutdown
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    panel = Panel()
+    try:
+        while True:
+            try:
+                panel.update(build_frame())
+            except TogglError as e:
+                print(f"[{time.ctime()}] ⚠️ Toggl unavailable ({e}), keeping the previous frame.")
+            except Exception as e:
+                print(f"⚠️ Update failed: {str(e)}")
+            # Sleep until the next interval boundary
+            time.sleep(interval - time.time() % interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        panel.close()
+
+def run_webhook(port, interval):
+    # Daemon mode fed by Toggl webhooks: a pushed change to today redraws the
+    # frame from the local store, the API is polled every interval only to
+    # catch missed deliveries
+    import threading
+    import webhook
+    from settings import get_settings
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    changed = threading.Event()
+    server = webhook.serve(get_settings().webhook_secret, changed.set, port=port)
+    print(f"[{time.ctime()}] Listening for Toggl webhooks on port {port}.")
+    panel = Panel()
+    next_poll = 0
+    # Webhook redraws keep the time of the last sync with the API, so missed
+    # polls still show up as stale
+    cached = toggl.load_aggregates()
+    fetched_at = cached[1] if cached else None
+    try:
+        while True:
+            try:
+                if time.time() >= next_poll:
+                    next_poll = time.time() + interval
+                    data = toggl.refresh_aggregates()
+                    fetched_at = time.time()
+                    warn_if_quota_low()
+                else:
+                    data = toggl.store_productivity_data(toggl.get_store())
+                    if fetched_at:
+                        toggl.save_aggregates(data, fetched_at)
+                data["today"] = toggl.get_today_minutes(TIMER_RECHECK_S, data.pop("timer", None))
+                panel.update(render(data, toggl.get_total_debt(data["total"]), fetched_at))
+            except TogglError as e:
+                print(f"[{time.ctime()}] ⚠️ Toggl unavailable ({e}), keeping the previous frame.")
+            except Exception as e:
+                print(f"⚠️ Update failed: {str(e)}")
+            changed.wait(max(next_poll - time.time(), 0))
+            changed.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        panel.close()
+
+def run_live():
+    # Full refresh every hour, in between only the today bar is redrawn
+    # every minute with the running timer extrapolated locally
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    panel = Panel()
+    data = total_debt = fetched_at = None
+    # The aggregates are fetched on their own hourly timer: an unchanged frame
+    # leaves the panel's cleanse due, which mustn't mean a fetch every minute
+    next_full = 0
+    try:
+        while True:
+            try:
+                if data is None or time.monotonic() >= next_full:
+                    next_full = time.monotonic() + CLEANSE_INTERVAL_S
+                    data, total_debt, fetched_at = fetch_frame_inputs()
+                    panel.update(render(data, total_debt, fetched_at))
+                else:
+                    data["today"] = toggl.get_today_minutes(TIMER_RECHECK_S)
+                    panel.update_partial(render(data, total_debt, fetched_at), TODAY_BAR_BOX)
+            except TogglError as e:
+                print(f"[{time.ctime()}] ⚠️ Toggl unavailable ({e}), keeping the previous frame.")
+            except Exception as e:
+                print(f"⚠️ Update failed: {str(e)}")
+            time.sleep(LIVE_INTERVAL_S - time.time() % LIVE_INTERVAL_S)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        panel.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the productivity dashboard on the e-ink panel.")
+    parser.add_argument("--daemon", action="store_true", help="keep running and refresh on an internal schedule")
+    parser.add_argument("--interval", type=int, default=UPDATE_INTERVAL_S, help="seconds between refreshes in daemon mode, or between cron runs otherwise")
+    parser.add_argument("--live", action="store_true", help="daemon mode that redraws the today bar every minute with fast partial refreshes")
+    parser.add_argument("--webhook-port", type=int, default=None, help="daemon mode that redraws on Toggl webhook events, polling only every --interval")
+    parser.add_argument("--profile-startup", action="store_true", help="report per-module import costs of a cold start and exit")
+    args = parser.parse_args()
 
+    if args.profile_startup:
+        profile_startup()
+    elif args.webhook_port:
+        run_webhook(args.webhook_port, args.interval)
+    elif args.live:
+        run_live()
+    elif args.daemon:
+        run_daemon(args.interval)
+    else:
+        run_once(args.interval)
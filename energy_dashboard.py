@@ -1,12 +1,10 @@
 from datetime import datetime, timedelta
 from collections import defaultdict
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageFont
 from zoneinfo import ZoneInfo
-from omegaconf import OmegaConf
 import epd7in5_V2
-
-# Load config
-cfg = OmegaConf.load("config.yaml")
+from canvas import PortraitCanvas
+from settings import get_settings
 
 # Constants
 DAILY_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
@@ -42,26 +40,22 @@ def draw_bar(draw, label, usage, cost, y, bold=False):
     draw.text((240 + bar_len + 10, y), f"€{cost:.2f}", font=font, fill=TEXT_COLOR)
     return y + LINE_HEIGHT + 10
 
-def render_dashboard():
-    epd = epd7in5_V2.EPD()
-    epd.init()
-    epd.Clear()
-
-    image = Image.new('1', (WIDTH, HEIGHT), BG_COLOR)
-    draw = ImageDraw.Draw(image)
+def render_image():
+    draw = PortraitCanvas(WIDTH, HEIGHT, BG_COLOR)
     bold = ImageFont.truetype(DAILY_FONT, 26)
 
     y = Y_START
     draw.text((X_MARGIN, y), "Monthly Electricity Summary", font=bold, fill=TEXT_COLOR)
     y += LINE_HEIGHT + 10
 
-    tariff = cfg.energy.tariffs.electricity
-    readings = cfg.energy.readings.electricity
+    energy = get_settings().energy
+    tariff = energy["tariffs"]["electricity"]
+    readings = energy["readings"]["electricity"]
 
     usage, costs = get_monthly_summary(
-        readings.entries,
-        readings.start_reading_kwh,
-        tariff.price_cents_per_kwh
+        readings["entries"],
+        readings["start_reading_kwh"],
+        tariff["price_cents_per_kwh"]
     )
 
     now = datetime.now(ZoneInfo("Europe/Vienna"))
@@ -76,6 +70,15 @@ def render_dashboard():
     if best_month[0]:
         y = draw_bar(draw, f"🏆 Best Month ({best_month[0]})", usage[best_month[0]], best_month[1], y)
 
+    return draw.image
+
+def render_dashboard():
+    epd = epd7in5_V2.EPD()
+    epd.init()
+    epd.Clear()
+
+    image = render_image()
+
     epd.display(epd.getbuffer(image))
     epd.sleep()
     print(f"[{datetime.now()}] Dashboard updated.")
@@ -0,0 +1,405 @@
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "toggl_entries.sqlite")
+LOCAL_TZ = ZoneInfo("Europe/Vienna")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    start INTEGER NOT NULL,
+    stop INTEGER,
+    duration INTEGER NOT NULL,
+    project_id INTEGER,
+    tags TEXT NOT NULL DEFAULT '[]',
+    at INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_start ON entries(start);
+CREATE TABLE IF NOT EXISTS deleted_entries (
+    id INTEGER PRIMARY KEY,
+    at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    entry_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    week TEXT NOT NULL,
+    seconds INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_entry ON segments(entry_id);
+CREATE INDEX IF NOT EXISTS segments_day ON segments(day, seconds);
+CREATE INDEX IF NOT EXISTS segments_week ON segments(week, seconds);
+CREATE TABLE IF NOT EXISTS day_totals (
+    day TEXT PRIMARY KEY,
+    seconds INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS day_projects (
+    day TEXT NOT NULL,
+    project_id INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    PRIMARY KEY (day, project_id)
+);
+CREATE TABLE IF NOT EXISTS week_tags (
+    week TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    seconds INTEGER NOT NULL,
+    PRIMARY KEY (week, tag)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def parse_ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def utc_offset(ts):
+    return int(datetime.fromtimestamp(ts, LOCAL_TZ).utcoffset().total_seconds())
+
+@lru_cache(maxsize=None)
+def day_offsets(utc_day):
+    # Offsets at both ends of a UTC day, they only differ on the two DST days
+    return utc_offset(utc_day * 86400), utc_offset(utc_day * 86400 + 86399)
+
+@lru_cache(maxsize=None)
+def local_buckets(day_number):
+    day = date(1970, 1, 1) + timedelta(days=day_number)
+    year, week, _ = day.isocalendar()
+    return day.isoformat(), f"{year}-W{week:02}"
+
+def buckets(ts):
+    # Local (day, week) keys of a unix timestamp
+    first, last = day_offsets(ts // 86400)
+    offset = first if first == last else utc_offset(ts)
+    return local_buckets((ts + offset) // 86400)
+
+def week_of(day):
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02}"
+
+def local_date(ts):
+    return date.fromisoformat(buckets(ts)[0])
+
+class Calendar:
+    """Local day boundaries over a range of days, as unix seconds.
+
+    Built with one ZoneInfo lookup per day, so DST days simply come out 23
+    or 25 hours long. Each day also knows its ISO week and month, so a
+    timestamp is bucketed into any of them with one searchsorted over
+    `bounds` instead of a conversion to a local datetime.
+    """
+
+    def __init__(self, first_day, last_day):
+        import numpy as np
+        self.first_day = first_day
+        self.last_day = last_day
+        days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 2)]
+        # Midnights from first_day through the one ending last_day
+        self.bounds = np.array([int(datetime(d.year, d.month, d.day, tzinfo=LOCAL_TZ).timestamp()) for d in days], dtype=np.int64)
+        self.day_keys, self.week_keys = zip(*(local_buckets((d - date(1970, 1, 1)).days) for d in days[:-1]))
+        self.month_keys = [key[:7] for key in self.day_keys]
+        self.weekdays = [d.weekday() for d in days[:-1]]
+
+    def covers(self, first_day, last_day):
+        return self.first_day <= first_day and last_day <= self.last_day
+
+    def day_index(self, ts):
+        # Index of the local day each timestamp falls on
+        import numpy as np
+        return np.searchsorted(self.bounds, ts, "right") - 1
+
+    def keys(self, ts):
+        # Local (day, week) keys for an array of unix timestamps
+        return [(self.day_keys[i], self.week_keys[i]) for i in self.day_index(ts).tolist()]
+
+    def split(self, ids, starts, stops):
+        # Clips entries at the day boundaries, see split_by_day
+        import numpy as np
+        first = self.day_index(starts)
+        last = np.searchsorted(self.bounds, stops, "left") - 1
+        counts = last - first + 1
+
+        # One row per (entry, day) pair, numbered from the entry's first day
+        entry = np.repeat(np.arange(len(ids)), counts)
+        day = first[entry] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        seconds = np.minimum(stops[entry], self.bounds[day + 1]) - np.maximum(starts[entry], self.bounds[day])
+        return [
+            (entry_id, self.day_keys[d], self.week_keys[d], s)
+            for entry_id, d, s in zip(ids[entry].tolist(), day.tolist(), seconds.tolist())
+        ]
+
+    def periods(self, ts):
+        """Keys and boundaries of the periods around a timestamp.
+
+        The calendar has to reach a week before the timestamp's day and one
+        day past it, which get_calendar(first, last) takes care of.
+        """
+        i = int(self.day_index(ts))
+        monday = i - self.weekdays[i]
+        return {
+            "today": self.day_keys[i],
+            "yesterday": self.day_keys[i - 1],
+            "tomorrow": self.day_keys[i + 1],
+            "this_week": self.week_keys[i],
+            "last_week": self.week_keys[monday - 1],
+            "this_month": self.month_keys[i],
+            "midnight": int(self.bounds[i]),
+            "next_midnight": int(self.bounds[i + 1]),
+        }
+
+_calendar = None
+
+def get_calendar(first_day, last_day):
+    # One calendar per process, rebuilt wider whenever a range falls outside it
+    global _calendar
+    calendar = _calendar
+    if calendar is None or not calendar.covers(first_day, last_day):
+        if calendar is not None:
+            first_day = min(first_day, calendar.first_day)
+            last_day = max(last_day, calendar.last_day)
+        calendar = _calendar = Calendar(first_day, last_day)
+    return calendar
+
+def split_by_day(ids, starts, stops):
+    """Clips entries to local day boundaries in one vectorized pass.
+
+    Takes parallel sequences of entry ids and start/stop unix seconds and
+    returns (entry_id, day, week, seconds) segments, one for every local day
+    an entry touches, so an entry running past midnight counts towards both
+    days. Day lengths follow DST.
+    """
+    # NumPy is only imported once there is something to split
+    import numpy as np
+    ids = np.asarray(ids, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    stops = np.asarray(stops, dtype=np.int64)
+    keep = stops > starts
+    ids, starts, stops = ids[keep], starts[keep], stops[keep]
+    if not len(ids):
+        return []
+    return get_calendar(local_date(int(starts.min())), local_date(int(stops.max()))).split(ids, starts, stops)
+
+def local_keys(ts):
+    # Local (day, week) keys for an array of unix timestamps
+    return get_calendar(local_date(int(ts.min())), local_date(int(ts.max()))).keys(ts)
+
+def current_periods(now=None):
+    # Today, yesterday, this and last week etc. for now (unix seconds)
+    now = int(time.time() if now is None else now)
+    today = local_date(now)
+    return get_calendar(today - timedelta(days=7), today + timedelta(days=1)).periods(now)
+
+def to_rows(entries):
+    # Rows of a TimeEntries batch: start/stop/at are stored as unix seconds.
+    # Running entries keep a NULL stop and are left out of every aggregate,
+    # the per-day split lives in segments.
+    if not len(entries):
+        return []
+    return list(zip(
+        entries.ids.tolist(), entries.start.tolist(), [stop if stop >= 0 else None for stop in entries.stop.tolist()],
+        entries.duration.tolist(), [project or None for project in entries.project.tolist()], entries.tags_json(),
+        entries.at.tolist()
+    ))
+
+class EntryStore:
+    """Local copy of the Toggl time entries, keyed by entry id."""
+
+    def __init__(self, path=STORE_PATH):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    # Sync bookkeeping
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def high_water_mark(self):
+        value = self.get_meta("high_water_mark")
+        return int(value) if value is not None else None
+
+    def upsert(self, entries, replace=False):
+        # Takes a TimeEntries batch or the API's JSON list and returns the
+        # newest server-side modification time seen, which becomes the `since`
+        # for the next incremental sync. replace=True swaps in a full
+        # download, dropping entries that were deleted in the meantime.
+        from time_entries import TimeEntries
+        if not isinstance(entries, TimeEntries):
+            entries = TimeEntries.from_json(entries)
+        live = entries.select(~entries.deleted)
+        closed = live.select(live.stop >= 0)
+        deleted = [(entry_id,) for entry_id in entries.ids[entries.deleted].tolist()]
+        # Deleted entries leave their modification time behind, so a late
+        # webhook delivery can't bring them back
+        tombstones = list(zip(entries.ids[entries.deleted].tolist(), entries.at[entries.deleted].tolist()))
+        rows = to_rows(live)
+
+        with self.db:
+            if replace:
+                self.db.execute("DELETE FROM entries")
+                self.db.execute("DELETE FROM segments")
+            else:
+                # Ids go in as one JSON array so each statement runs once per batch
+                changed = json.dumps([entry_id for (entry_id,) in deleted] + [row[0] for row in rows])
+                days = {day for (day,) in self.db.execute(
+                    "SELECT DISTINCT day FROM segments WHERE entry_id IN (SELECT value FROM json_each(?))", (changed,)
+                )}
+                self.db.executemany("DELETE FROM entries WHERE id = ?", deleted)
+                self.db.execute("DELETE FROM segments WHERE entry_id IN (SELECT value FROM json_each(?))", (changed,))
+            self.db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany("INSERT OR REPLACE INTO deleted_entries VALUES (?, ?)", tombstones)
+            segments = self.add_segments(closed.ids, closed.start, closed.stop)
+            if replace:
+                self.rebuild_day_totals()
+                self.rebuild_breakdowns()
+            else:
+                days.update(segment[1] for segment in segments)
+                self.update_day_totals(days)
+                self.update_breakdowns(days)
+        return entries.newest_at
+
+    def add_segments(self, ids, starts, stops):
+        # Splits closed entries at local midnight, returns the new segments
+        if not len(ids):
+            return []
+        segments = split_by_day(ids, starts, stops)
+        self.db.executemany("INSERT INTO segments VALUES (?, ?, ?, ?)", segments)
+        return segments
+
+    def commit_sync(self, high_water_mark):
+        with self.db:
+            self.set_meta("high_water_mark", high_water_mark)
+
+    # Per-day totals plus their running sum in meta, so the all-time total is
+    # a single lookup instead of a scan over every segment
+    def rebuild_day_totals(self):
+        self.db.execute("DELETE FROM day_totals")
+        self.db.execute("INSERT INTO day_totals SELECT day, SUM(seconds) FROM segments GROUP BY day")
+        total = self.db.execute("SELECT COALESCE(SUM(seconds), 0) FROM day_totals").fetchone()[0]
+        self.set_meta("total_seconds", total)
+
+    def update_day_totals(self, days):
+        # Re-sums the touched days and moves the running total by the difference
+        days = json.dumps(sorted(days))
+        in_days = "day IN (SELECT value FROM json_each(?))"
+        before = self.db.execute(f"SELECT COALESCE(SUM(seconds), 0) FROM day_totals WHERE {in_days}", (days,)).fetchone()[0]
+        self.db.execute(f"DELETE FROM day_totals WHERE {in_days}", (days,))
+        self.db.execute(f"INSERT INTO day_totals SELECT day, SUM(seconds) FROM segments WHERE {in_days} GROUP BY day", (days,))
+        after = self.db.execute(f"SELECT COALESCE(SUM(seconds), 0) FROM day_totals WHERE {in_days}", (days,)).fetchone()[0]
+        if after != before:
+            self.set_meta("total_seconds", int(self.get_meta("total_seconds", 0)) + after - before)
+
+    # Rollups of the day segments by (day, project) and (week, tag), kept up
+    # to date like the day totals. Entries without a project count as project
+    # 0, an entry with several tags counts towards each of them.
+    def rebuild_breakdowns(self):
+        self.db.execute("DELETE FROM day_projects")
+        self.db.execute("DELETE FROM week_tags")
+        self.insert_day_projects("")
+        self.insert_week_tags("")
+
+    def update_breakdowns(self, days):
+        days = json.dumps(sorted(days))
+        weeks = json.dumps(sorted({week_of(day) for day in json.loads(days)}))
+        self.db.execute("DELETE FROM day_projects WHERE day IN (SELECT value FROM json_each(?))", (days,))
+        self.db.execute("DELETE FROM week_tags WHERE week IN (SELECT value FROM json_each(?))", (weeks,))
+        self.insert_day_projects("WHERE s.day IN (SELECT value FROM json_each(?))", (days,))
+        self.insert_week_tags("WHERE s.week IN (SELECT value FROM json_each(?))", (weeks,))
+
+    def insert_day_projects(self, where, params=()):
+        self.db.execute(f"""
+            INSERT INTO day_projects
+            SELECT s.day, COALESCE(e.project_id, 0) AS project, SUM(s.seconds)
+            FROM segments s JOIN entries e ON e.id = s.entry_id {where}
+            GROUP BY s.day, project
+        """, params)
+
+    def insert_week_tags(self, where, params=()):
+        self.db.execute(f"""
+            INSERT INTO week_tags
+            SELECT s.week, t.value, SUM(s.seconds)
+            FROM segments s JOIN entries e ON e.id = s.entry_id, json_each(e.tags) t {where}
+            GROUP BY s.week, t.value
+        """, params)
+
+    def entry_at(self, entry_id):
+        # Last modification time stored for an entry, deleted ones included
+        row = self.db.execute(
+            "SELECT MAX(at) FROM (SELECT at FROM entries WHERE id = ? UNION ALL SELECT at FROM deleted_entries WHERE id = ?)",
+            (entry_id, entry_id)
+        ).fetchone()
+        return row[0]
+
+    def running_entry(self):
+        # Id of the newest entry without a stop, as of the last sync or webhook
+        row = self.db.execute("SELECT id FROM entries WHERE stop IS NULL ORDER BY start DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    # Aggregates over the day segments, in whole minutes per period. Running
+    # entries have no segments until they stop.
+    def minutes_on_day(self, day):
+        row = self.db.execute("SELECT seconds FROM day_totals WHERE day = ?", (day,)).fetchone()
+        return row[0] // 60 if row else 0
+
+    def minutes_in_week(self, week):
+        row = self.db.execute(
+            "SELECT COALESCE(SUM(seconds), 0) / 60 FROM segments WHERE week = ?", (week,)
+        ).fetchone()
+        return row[0]
+
+    def minutes_since(self, start):
+        # Counts whole local days from the day of start onwards: the running
+        # total minus the (usually empty) days before it
+        before = self.db.execute(
+            "SELECT COALESCE(SUM(seconds), 0) FROM day_totals WHERE day < ?",
+            (start.astimezone(LOCAL_TZ).date().isoformat(),)
+        ).fetchone()[0]
+        return (int(self.get_meta("total_seconds", 0)) - before) // 60
+
+    def top_periods(self, column, k, first=None, until=None):
+        # Best k days, weeks or months by minutes, optionally limited to keys in [first, until)
+        clauses = []
+        params = []
+        if first is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(first)
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(until)
+        query = f"SELECT {column}, SUM(seconds) / 60 AS minutes FROM segments"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += f" GROUP BY {column} ORDER BY minutes DESC LIMIT ?"
+        params.append(k)
+        return self.db.execute(query, params).fetchall()
+
+    def top_days(self, k, first=None, until=None):
+        return self.top_periods("day", k, first, until)
+
+    def top_weeks(self, k, first=None, until=None):
+        return self.top_periods("week", k, first, until)
+
+    def top_months(self, k, first=None, until=None):
+        # Months as "YYYY-MM" keys
+        return self.top_periods("substr(day, 1, 7)", k, first, until)
+
+    def project_minutes(self, first, until):
+        # Minutes per project id over the days in [first, until), largest first
+        return dict(self.db.execute(
+            "SELECT project_id, SUM(seconds) / 60 AS minutes FROM day_projects"
+            " WHERE day >= ? AND day < ? GROUP BY project_id ORDER BY minutes DESC",
+            (first, until)
+        ))
+
+    def tag_minutes(self, week):
+        # Minutes per tag in a week, largest first
+        return dict(self.db.execute(
+            "SELECT tag, seconds / 60 FROM week_tags WHERE week = ? ORDER BY seconds DESC", (week,)
+        ))
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import time
+import waveshare_epd.epdconfig as epdconfig
+import epd7in5_V2
+import dashboard
+import energy_dashboard
+from settings import get_settings
+
+# Panel wiring. The first panel uses the HAT's default pins on CE0, the
+# second one sits on CE1 with its own RST/DC/BUSY/PWR lines. Both can be
+# overridden from a `panels:` section in config.yaml.
+DEFAULT_PANELS = {
+    "productivity": {"spi_device": 0},
+    "energy": {"spi_device": 1, "rst_pin": 5, "dc_pin": 6, "busy_pin": 13, "pwr_pin": 19},
+}
+
+RENDERERS = {
+    "productivity": dashboard.build_frame,
+    "energy": energy_dashboard.render_image,
+}
+
+def load_wiring():
+    wiring = {name: dict(pins) for name, pins in DEFAULT_PANELS.items()}
+    for name, pins in get_settings().panels.items():
+        if name in wiring:
+            wiring[name].update(pins)
+    return wiring
+
+def make_epd(pins):
+    # The default pins are already claimed by the module-level epdconfig
+    # implementation, so only other wirings get their own instance
+    if pins.get("spi_device", 0) == 0 and not any(key.endswith("_pin") for key in pins):
+        return epd7in5_V2.EPD()
+    return epd7in5_V2.EPD(epdconfig.RaspberryPi(**pins))
+
+def refresh(name, epd, render):
+    started = time.monotonic()
+    image = render()
+    epd.init()
+    epd.display(epd.getbuffer(image))
+    epd.sleep()
+    return name, time.monotonic() - started
+
+def update_all(panels):
+    # One worker per panel: while one panel sits in a BUSY wait the others
+    # keep transferring, so the total is close to the slowest panel
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(panels)) as pool:
+        futures = [pool.submit(refresh, name, epd, render) for name, epd, render in panels]
+        for future in futures:
+            try:
+                name, elapsed = future.result()
+                print(f"  {name}: {elapsed:.1f}s")
+            except Exception as e:
+                print(f"⚠️ Panel update failed: {str(e)}")
+    print(f"[{datetime.now()}] {len(panels)} panels updated in {time.monotonic() - started:.1f}s.")
+
+if __name__ == "__main__":
+    wiring = load_wiring()
+    update_all([(name, make_epd(pins), RENDERERS[name]) for name, pins in wiring.items()])
@@ -0,0 +1,91 @@
+import json
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+# Resolved copy of config.yaml, reused while the file's mtime and size are
+# unchanged so a cold start doesn't have to import and run OmegaConf
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.snapshot.json")
+
+class ConfigError(ValueError):
+    """A required config.yaml key is missing."""
+
+@dataclass(frozen=True)
+class ApiSettings:
+    token: str
+    workspace_id: int
+    base_url: str
+    # Request pacing shared by every process using the token
+    rate_per_s: float = 1.0
+    burst: int = 4
+
+@dataclass(frozen=True)
+class Settings:
+    api: ApiSettings
+    max_date_range_days: int
+    days_off: tuple = ()
+    webhook_secret: Optional[str] = None
+    panels: dict = field(default_factory=dict)
+    energy: dict = field(default_factory=dict)
+
+def load_snapshot(stamp):
+    try:
+        with open(SNAPSHOT_PATH) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return snapshot.get("config") if snapshot.get("stamp") == stamp else None
+
+def save_snapshot(stamp, raw):
+    # Holds the API token like config.yaml itself, so keep it private
+    tmp_path = SNAPSHOT_PATH + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"stamp": stamp, "config": raw}, f)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+
+def load_raw(path=CONFIG_PATH):
+    stat = os.stat(path)
+    stamp = [path, stat.st_mtime_ns, stat.st_size]
+    raw = load_snapshot(stamp)
+    if raw is None:
+        from omegaconf import OmegaConf
+        raw = OmegaConf.to_container(OmegaConf.load(path), resolve=True)
+        try:
+            save_snapshot(stamp, raw)
+        except OSError as e:
+            print(f"⚠️ Couldn't write config snapshot: {e}")
+    return raw
+
+def required(value, key, env=None):
+    if value is None or value == "":
+        source = f"{key} in config.yaml" + (f" or {env}" if env else "")
+        raise ConfigError(f"Missing {source}")
+    return value
+
+@lru_cache(maxsize=None)
+def get_settings():
+    # Resolved on first use and cached for the life of the process;
+    # TOGGL_API_TOKEN, TOGGL_WORKSPACE_ID, TOGGL_BASE_URL (e.g. pointing
+    # at toggl_stub.py) and TOGGL_WEBHOOK_SECRET override the file
+    raw = load_raw()
+    api = raw.get("api") or {}
+    settings = raw.get("settings") or {}
+    return Settings(
+        api=ApiSettings(
+            token=required(os.getenv("TOGGL_API_TOKEN", api.get("token")), "api.token", "TOGGL_API_TOKEN"),
+            workspace_id=int(required(
+                os.getenv("TOGGL_WORKSPACE_ID", api.get("workspace_id")), "api.workspace_id", "TOGGL_WORKSPACE_ID"
+            )),
+            base_url=required(os.getenv("TOGGL_BASE_URL", api.get("base_url")), "api.base_url", "TOGGL_BASE_URL"),
+            rate_per_s=float(api.get("rate_per_s", 1.0)),
+            burst=int(api.get("burst", 4)),
+        ),
+        max_date_range_days=int(required(settings.get("max_date_range_days"), "settings.max_date_range_days")),
+        days_off=tuple(str(day) for day in settings.get("days_off") or ()),
+        webhook_secret=os.getenv("TOGGL_WEBHOOK_SECRET", (raw.get("webhook") or {}).get("secret")),
+        panels=raw.get("panels") or {},
+        energy=raw.get("energy") or {},
+    )
@@ -0,0 +1,69 @@
+from datetime import date, datetime
+import numpy as np
+from entry_store import LOCAL_TZ, Calendar, current_periods, split_by_day
+
+def local_ts(*args):
+    return int(datetime(*args, tzinfo=LOCAL_TZ).timestamp())
+
+def test_split_by_day_clips_at_midnight():
+    start, stop = local_ts(2025, 6, 10, 22), local_ts(2025, 6, 11, 1, 30)
+    assert split_by_day([1], [start], [stop]) == [
+        (1, "2025-06-10", "2025-W24", 2 * 3600),
+        (1, "2025-06-11", "2025-W24", 90 * 60),
+    ]
+
+def test_split_by_day_follows_spring_forward():
+    # 2025-03-30 is 23 hours long, so 00:00-12:00 is 11 hours
+    start, stop = local_ts(2025, 3, 29, 22), local_ts(2025, 3, 30, 12)
+    assert split_by_day([1], [start], [stop]) == [
+        (1, "2025-03-29", "2025-W13", 2 * 3600),
+        (1, "2025-03-30", "2025-W13", 11 * 3600),
+    ]
+
+def test_split_by_day_follows_fall_back():
+    # 2025-10-26 is 25 hours long and the entry spans it whole, into the next week
+    start, stop = local_ts(2025, 10, 26), local_ts(2025, 10, 27, 1)
+    assert split_by_day([1], [start], [stop]) == [
+        (1, "2025-10-26", "2025-W43", 25 * 3600),
+        (1, "2025-10-27", "2025-W44", 3600),
+    ]
+
+def test_split_by_day_drops_empty_entries():
+    start = local_ts(2025, 6, 10, 9)
+    assert split_by_day([1, 2], [start, start], [start, start + 60]) == [(2, "2025-06-10", "2025-W24", 60)]
+    assert split_by_day([], [], []) == []
+
+def test_calendar_day_lengths_follow_dst():
+    calendar = Calendar(date(2025, 3, 29), date(2025, 3, 31))
+    assert np.diff(calendar.bounds).tolist() == [24 * 3600, 23 * 3600, 24 * 3600]
+
+def test_calendar_buckets_like_local_datetimes():
+    calendar = Calendar(date(2025, 3, 25), date(2025, 11, 5))
+    ts = np.arange(calendar.bounds[0], calendar.bounds[-1], 3917, dtype=np.int64)
+    expected = []
+    for t in ts.tolist():
+        local = datetime.fromtimestamp(t, LOCAL_TZ)
+        year, week, _ = local.isocalendar()
+        expected.append((local.date().isoformat(), f"{year}-W{week:02}"))
+    assert calendar.keys(ts) == expected
+
+def test_calendar_buckets_the_edges_of_a_day():
+    calendar = Calendar(date(2025, 10, 25), date(2025, 10, 27))
+    midnight = local_ts(2025, 10, 27)
+    assert calendar.keys(np.array([midnight - 1, midnight])) == [("2025-10-26", "2025-W43"), ("2025-10-27", "2025-W44")]
+
+def test_current_periods_around_fall_back():
+    periods = current_periods(local_ts(2025, 10, 26, 12))
+    assert periods["today"] == "2025-10-26"
+    assert periods["yesterday"] == "2025-10-25"
+    assert periods["tomorrow"] == "2025-10-27"
+    assert periods["this_week"] == "2025-W43"
+    assert periods["last_week"] == "2025-W42"
+    assert periods["this_month"] == "2025-10"
+    assert periods["midnight"] == local_ts(2025, 10, 26)
+    assert periods["next_midnight"] - periods["midnight"] == 25 * 3600
+
+def test_current_periods_on_a_monday():
+    periods = current_periods(local_ts(2025, 12, 1, 0, 30))
+    assert (periods["yesterday"], periods["this_week"], periods["last_week"]) == ("2025-11-30", "2025-W49", "2025-W48")
+    assert periods["this_month"] == "2025-12"
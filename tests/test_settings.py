@@ -0,0 +1,33 @@
+import pytest
+import settings
+
+RAW = {"api": {"token": "t", "workspace_id": "7", "base_url": "http://x"}, "settings": {"max_date_range_days": 90}}
+
+@pytest.fixture
+def load(monkeypatch):
+    for env in ("TOGGL_API_TOKEN", "TOGGL_WORKSPACE_ID", "TOGGL_BASE_URL", "TOGGL_WEBHOOK_SECRET"):
+        monkeypatch.delenv(env, raising=False)
+
+    def load(raw):
+        monkeypatch.setattr(settings, "load_raw", lambda: raw)
+        settings.get_settings.cache_clear()
+        try:
+            return settings.get_settings()
+        finally:
+            settings.get_settings.cache_clear()
+    return load
+
+def test_settings_are_typed(load):
+    loaded = load(RAW)
+    assert loaded.api.workspace_id == 7
+    assert loaded.max_date_range_days == 90
+    assert loaded.webhook_secret is None
+
+def test_missing_workspace_id_names_the_key(load):
+    raw = dict(RAW, api={"token": "t", "base_url": "http://x"})
+    with pytest.raises(settings.ConfigError, match="api.workspace_id"):
+        load(raw)
+
+def test_env_fills_in_for_the_file(load, monkeypatch):
+    monkeypatch.setenv("TOGGL_WORKSPACE_ID", "9")
+    assert load(dict(RAW, api={"token": "t", "base_url": "http://x"})).api.workspace_id == 9
@@ -0,0 +1,43 @@
+from time_entries import TimeEntries, parse_timestamps
+
+def entry(entry_id, start, stop, duration, **fields):
+    return dict({"id": entry_id, "start": start, "stop": stop, "duration": duration, "at": start}, **fields)
+
+ENTRIES = [
+    entry(1, "2025-06-10T08:00:00+00:00", "2025-06-10T09:30:00+00:00", 5400, project_id=201, tags=["deep"]),
+    # Running: no stop, duration is minus the start
+    entry(2, "2025-06-10T10:00:00Z", None, -1749549600, tags=["deep", "review"]),
+    entry(3, "2025-06-10T07:00:00+00:00", "2025-06-10T07:10:00+00:00", 600, server_deleted_at="2025-06-10T12:00:00+00:00"),
+]
+
+def test_from_json_columns():
+    entries = TimeEntries.from_json(ENTRIES)
+    assert entries.ids.tolist() == [1, 2, 3]
+    assert entries.start.tolist() == [1749542400, 1749549600, 1749538800]
+    assert entries.stop.tolist() == [1749547800, -1, 1749539400]
+    assert entries.project.tolist() == [201, 0, 0]
+    assert [entries.tag_names(bits) for bits in entries.tag_bits] == [["deep"], ["deep", "review"], []]
+    assert entries.newest_at == 1749549600
+
+def test_running_and_deleted_entries_are_not_closed():
+    entries = TimeEntries.from_json(ENTRIES)
+    assert entries.deleted.tolist() == [False, False, True]
+    assert entries.closed.tolist() == [True, False, False]
+    assert entries.total_minutes() == 90
+
+def test_from_json_skips_unreadable_entries():
+    entries = TimeEntries.from_json([{"id": 4}] + ENTRIES[:1])
+    assert entries.ids.tolist() == [1]
+    assert len(TimeEntries.from_json([])) == 0
+
+def test_parse_timestamps_handles_offsets_and_fractions():
+    assert parse_timestamps(["2025-06-10T10:00:00Z", "2025-06-10T10:00:00+00:00"]).tolist() == [1749549600] * 2
+    assert parse_timestamps(["2025-06-10T12:00:00+02:00", "2025-06-10T10:00:00.750Z"]).tolist() == [1749549600] * 2
+
+def test_newest_at_compares_instants_not_strings():
+    # As strings the first one sorts last, but it's an hour earlier
+    entries = TimeEntries.from_json([
+        entry(1, "2025-06-10T08:00:00Z", "2025-06-10T09:00:00Z", 3600, at="2025-06-10T11:30:00+02:00"),
+        entry(2, "2025-06-10T08:00:00Z", "2025-06-10T09:00:00Z", 3600, at="2025-06-10T10:30:00.5Z"),
+    ])
+    assert entries.newest_at == 1749551400
@@ -0,0 +1,127 @@
+import json
+from datetime import date, timedelta
+import toggl
+import toggl_stub
+from entry_store import EntryStore
+from toggl import count_weekdays, push_top, ranked
+
+def brute_weekdays(first, last):
+    return sum(1 for i in range((last - first).days + 1) if (first + timedelta(days=i)).weekday() < 5)
+
+def test_count_weekdays_matches_counting_day_by_day():
+    monday = date(2025, 4, 7)
+    for offset in range(7):
+        first = monday + offset * timedelta(days=1)
+        for length in range(30):
+            last = first + timedelta(days=length)
+            assert count_weekdays(first, last) == brute_weekdays(first, last), (first, last)
+
+def test_count_weekdays_of_an_empty_range():
+    assert count_weekdays(date(2025, 4, 9), date(2025, 4, 8)) == 0
+
+def test_push_top_keeps_the_k_largest():
+    heap = []
+    for i, minutes in enumerate([50, 10, 70, 30, 90, 20]):
+        push_top(heap, f"day-{i}", minutes, k=3)
+    assert sorted(heap) == [[50, "day-0"], [70, "day-2"], [90, "day-4"]]
+    assert heap[0] == [50, "day-0"]
+
+def test_push_top_ignores_keys_already_ranked():
+    heap = []
+    push_top(heap, "2025-06-10", 100, k=3)
+    push_top(heap, "2025-06-10", 200, k=3)
+    assert heap == [[100, "2025-06-10"]]
+
+def test_ranked_compares_open_periods_on_the_fly():
+    heap = [[50, "a"], [90, "b"], [70, "c"]]
+    assert ranked(heap, 2) == [("b", 90), ("c", 70)]
+    assert ranked(heap, 2, [("c", 95)]) == [("c", 95), ("b", 90)]
+    # A still-open period never ranks below its closed value
+    assert ranked(heap, 3, [("b", 10)]) == [("b", 90), ("c", 70), ("a", 50)]
+
+def test_update_leaderboard_drops_periods_before_the_tracking_start(tmp_path, monkeypatch):
+    monkeypatch.setattr(toggl, "BEST_CACHE_PATH", str(tmp_path / "best.json"))
+    store = EntryStore(":memory:")
+    store.upsert(toggl_stub.make_entries(60), replace=True)
+    # Heaps seeded from the old best_day/best_week cache
+    with open(toggl.BEST_CACHE_PATH, "w") as f:
+        json.dump({"top_days": [[442, "2025-03-03"]], "top_weeks": [[1261, "2025-W09"]], "top_months": [],
+                   "cached_at": "2025-04-09T00:00:00+02:00"}, f)
+
+    cache = toggl.update_leaderboard(store)
+    start_day = toggl.TRACKING_START_DATE.date().isoformat()
+    assert all(key >= start_day for _, key in cache["top_days"])
+    assert all(key >= toggl.week_of(start_day) for _, key in cache["top_weeks"])
+    assert ranked(cache["top_days"], 1) == store.top_days(1, start_day, toggl.current_periods()["today"])
+
+def test_load_aggregates_treats_bad_caches_as_misses(tmp_path, monkeypatch):
+    path = tmp_path / "aggregates.json"
+    monkeypatch.setattr(toggl, "AGGREGATES_CACHE_PATH", str(path))
+    assert toggl.load_aggregates() is None
+    for text in ('{"data": {"today": 5', '{"today": 5}', '{"data": {"today": 5}, "fetched_at": 1}',
+                 '{"data": null, "fetched_at": 1}', '{"data": {}, "fetched_at": "never"}'):
+        path.write_text(text)
+        assert toggl.load_aggregates() is None, text
+
+    data = dict(toggl.empty_productivity_data(), breakdowns={"today": {"projects": {201: 30}, "tags": {}}})
+    toggl.save_aggregates(data, 1000.0)
+    assert toggl.load_aggregates() == (data, 1000.0)
+
+def timer(now, running_since, running_id=7):
+    periods = toggl.current_periods(now)
+    return {"midnight": periods["midnight"], "next_midnight": periods["next_midnight"],
+            "running_id": running_id, "running_since": running_since, "checked_at": now}
+
+def test_get_today_minutes_extrapolates_the_running_timer(monkeypatch):
+    periods = toggl.current_periods()
+    # Noon today, so the timer never crosses midnight
+    clock = [periods["midnight"] + 12 * 3600]
+    checks = []
+    monkeypatch.setattr(toggl.time, "time", lambda: clock[0])
+    monkeypatch.setattr(toggl, "_today", None)
+    monkeypatch.setattr(toggl, "get_store", lambda: store)
+    monkeypatch.setattr(toggl, "check_today", lambda: checks.append(clock[0]) or timer(clock[0], clock[0] - 380 * 60, None))
+    store = EntryStore(":memory:")
+
+    # A refresh's check is reused, without a running entry in the store it doesn't match
+    assert toggl.get_today_minutes(900, timer(clock[0], clock[0] - 60 * 60, None)) == 60
+    assert checks == []
+    clock[0] += 5 * 60
+    assert toggl.get_today_minutes(900) == 65
+    assert checks == []
+
+    # Reaching the daily goal asks again
+    monkeypatch.setattr(toggl, "_today", timer(clock[0], clock[0] - 385 * 60, None))
+    clock[0] += 6 * 60
+    assert toggl.get_today_minutes(900) == 380
+    assert len(checks) == 1
+
+    # So does a running entry the store no longer has, e.g. stopped by a webhook
+    monkeypatch.setattr(toggl, "_today", timer(clock[0], clock[0] - 30 * 60, running_id=7))
+    toggl.get_today_minutes(900)
+    assert len(checks) == 2
+
+def test_extrapolate_today_counts_from_midnight():
+    periods = toggl.current_periods()
+    state = timer(periods["midnight"] + 3600, periods["midnight"] - 3600)
+    assert toggl.extrapolate_today(10, state, periods["midnight"] + 3600) == 70
+    assert toggl.extrapolate_today(10, None, periods["midnight"] + 3600) == 10
+    # A day later only the running timer carries over to the new day
+    assert toggl.extrapolate_today(0, state, periods["next_midnight"] + 120) == 2
+
+def test_update_leaderboard_rebuilds_unusable_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(toggl, "BEST_CACHE_PATH", str(tmp_path / "best.json"))
+    store = EntryStore(":memory:")
+    store.upsert(toggl_stub.make_entries(60), replace=True)
+    today = toggl.current_periods()["today"]
+    start_day = toggl.TRACKING_START_DATE.date().isoformat()
+    expected = store.top_days(1, start_day, today)
+
+    for text in ('{"best_day": ["2025-05-05", 400], "best_week": ["2025-W19", 2000], "cached_at": "2025-05-06T00:00:00"}',
+                 '{"top_days": [], "cached_at": "2025-05-06T00:00:00+02:00"}',
+                 '{"top_days": [[1, "2025-05-05"]], "top_weeks": [], "top_months": [], "cached_at": "2025-05-06T00:00:00+02:00"}'[:60],
+                 '{"top_days": [["x"]], "top_weeks": [], "top_months": [], "cached_at": "2025-05-06"}',
+                 '[]'):
+        (tmp_path / "best.json").write_text(text)
+        toggl.get_leaderboard(1, store)
+        assert ranked(toggl.load_best_cache()["top_days"], 1) == expected, text
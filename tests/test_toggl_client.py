@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+import toggl_stub
+from toggl_client import PRIORITY_BACKFILL, PRIORITY_TODAY, RateLimiter, TogglClient, TogglRateLimited, iter_json_array
+
+QUOTA_HEADERS = {"X-Toggl-Quota-Remaining": "10", "X-Toggl-Quota-Resets-In": "120"}
+
+# Brackets, braces and quotes inside strings must not end an item early
+ITEMS = [{"id": i, "description": 'a], {b} "c"', "tags": ["deep"]} for i in range(20)]
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_iter_json_array_decodes_items_split_across_chunks():
+    text = json.dumps(ITEMS, indent=1)
+    for size in (1, 7, 64, len(text)):
+        assert list(iter_json_array(chunked(text, size))) == ITEMS
+    assert list(iter_json_array(["  [", "]"])) == []
+
+def test_iter_json_array_rejects_truncated_text():
+    text = json.dumps(ITEMS)
+    decoded = []
+    with pytest.raises(ValueError, match="ended early"):
+        for item in iter_json_array(chunked(text[:-30], 16)):
+            decoded.append(item)
+    assert decoded == ITEMS[:-1]
+    with pytest.raises(ValueError, match="ended early"):
+        list(iter_json_array([]))
+
+def test_iter_json_array_rejects_other_documents():
+    with pytest.raises(ValueError, match="expected a JSON array"):
+        list(iter_json_array(['{"error": "not found"}']))
+
+@pytest.fixture
+def limiter(tmp_path):
+    # Practically no refill, so every token taken stays taken
+    return RateLimiter(rate_per_s=0.001, burst=2, reserve_tokens=1, reserve_quota=10, path=str(tmp_path / "rate_limit.json"))
+
+def test_backfill_leaves_the_token_reserve_to_today(limiter):
+    assert limiter.try_acquire(PRIORITY_BACKFILL) == 0
+    assert limiter.try_acquire(PRIORITY_BACKFILL) > 0
+    assert limiter.try_acquire(PRIORITY_TODAY) == 0
+    assert limiter.try_acquire(PRIORITY_TODAY) > 0
+
+def test_backfill_waits_for_the_quota_reset_inside_the_reserve(limiter):
+    limiter.observe(200, QUOTA_HEADERS)
+    assert 100 < limiter.try_acquire(PRIORITY_BACKFILL) <= 120
+    assert limiter.try_acquire(PRIORITY_TODAY) == 0
+    assert limiter.headroom()["quota_remaining"] == 9
+
+def test_429_drains_the_bucket(limiter):
+    limiter.observe(429, {})
+    assert limiter.headroom()["tokens"] < 0.01
+    with pytest.raises(TogglRateLimited):
+        limiter.acquire(PRIORITY_TODAY, max_wait_s=1)
+
+def test_402_is_not_retried_and_blocks_further_requests(tmp_path):
+    server = toggl_stub.serve([], quota=0)
+    try:
+        limiter = RateLimiter(rate_per_s=100, burst=10, path=str(tmp_path / "rate_limit.json"))
+        client = TogglClient(server.base_url, "stub", 30, backoff_s=0, limiter=limiter)
+        with pytest.raises(TogglRateLimited, match="402"):
+            client.get("/me/time_entries/current")
+        assert server.requests == 1
+        assert limiter.headroom()["quota_remaining"] == 0
+
+        # The exhausted quota is known locally now, so nothing goes out
+        with pytest.raises(TogglRateLimited):
+            client.get("/me/time_entries/current")
+        assert server.requests == 1
+    finally:
+        server.shutdown()
+
+def fast_client(server, tmp_path, **kwargs):
+    limiter = RateLimiter(rate_per_s=1000, burst=1000, path=str(tmp_path / "rate_limit.json"))
+    return TogglClient(server.base_url, "stub", 10, backoff_s=0, limiter=limiter, **kwargs)
+
+def test_multi_page_ranges_are_reassembled(tmp_path):
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    entries = toggl_stub.make_entries(30, end=end)
+    # Entries sharing a start second, straddling a page boundary
+    entries += [dict(entries[-1], id=entry_id) for entry_id in range(1, 4)]
+    server = toggl_stub.serve(entries, page_size=7)
+    try:
+        client = fast_client(server, tmp_path, page_size=7)
+        fetched = client.time_entries(end - timedelta(days=31), end)
+        assert sorted(entry["id"] for entry in fetched) == sorted(entry["id"] for entry in entries)
+        assert server.requests > len(client.date_chunks(end - timedelta(days=31), end))
+
+        since = list(client.time_entries_since(0))
+        assert sorted(entry["id"] for entry in since) == sorted(entry["id"] for entry in entries)
+    finally:
+        server.shutdown()
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timezone
+import toggl_stub
+import webhook_replay
+from entry_store import EntryStore, current_periods
+from webhook import apply_event, sign, today_aggregates, verify_signature
+
+SECRET = "s3cret"
+
+def test_verify_signature():
+    body = json.dumps({"payload": "ping"}).encode()
+    assert verify_signature(SECRET, body, sign(SECRET, body))
+    assert not verify_signature("other", body, sign(SECRET, body))
+    assert not verify_signature(SECRET, body + b" ", sign(SECRET, body))
+    assert not verify_signature(SECRET, body, None)
+    assert not verify_signature(SECRET, body, "")
+
+def utc(ts):
+    return toggl_stub.ts(datetime.fromtimestamp(ts, timezone.utc))
+
+def todays_entry(minutes=10, version=0):
+    # From 01:00 local today, whatever the time of day; each version is a
+    # later modification
+    start = current_periods()["midnight"] + 3600
+    return {
+        "id": 42, "workspace_id": 1, "user_id": 1, "project_id": 201, "tags": ["deep"],
+        "start": utc(start), "stop": utc(start + minutes * 60), "duration": minutes * 60,
+        "at": utc(start + 3600 + version * 60), "server_deleted_at": None,
+    }
+
+def test_apply_event_upserts_and_deletes():
+    store = EntryStore(":memory:")
+
+    assert apply_event(store, webhook_replay.event("created", todays_entry(), 1))
+    assert today_aggregates(store) == (10, {201: 10})
+    # A redelivery changes nothing
+    assert not apply_event(store, webhook_replay.event("created", todays_entry(), 1))
+
+    assert apply_event(store, webhook_replay.event("updated", todays_entry(25, version=1), 2))
+    assert today_aggregates(store) == (25, {201: 25})
+
+    # Deleted events don't always carry server_deleted_at
+    assert apply_event(store, webhook_replay.event("deleted", todays_entry(25, version=2), 3))
+    assert today_aggregates(store) == (0, {})
+
+def test_apply_event_ignores_deliveries_older_than_the_store():
+    store = EntryStore(":memory:")
+    apply_event(store, webhook_replay.event("updated", todays_entry(25, version=1), 2))
+    assert not apply_event(store, webhook_replay.event("created", todays_entry(10, version=0), 1))
+    assert today_aggregates(store) == (25, {201: 25})
+
+    # A late update doesn't bring a deleted entry back
+    apply_event(store, webhook_replay.event("deleted", todays_entry(25, version=3), 4))
+    assert not apply_event(store, webhook_replay.event("updated", todays_entry(40, version=2), 3))
+    assert today_aggregates(store) == (0, {})
+
+def test_apply_event_ignores_other_models():
+    store = EntryStore(":memory:")
+    event = webhook_replay.event("created", todays_entry(), 1)
+    event["metadata"]["model"] = "project"
+    assert not apply_event(store, event)
+    assert not apply_event(store, {"payload": "ping", "validation_code": "abc"})
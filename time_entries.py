@@ -0,0 +1,105 @@
+import json
+import numpy as np
+from entry_store import parse_ts
+
+def parse_timestamps(values):
+    # Unix seconds of ISO timestamps. Toggl sends whole-second UTC ones,
+    # which NumPy parses in one go once the offset is cut off; offsets or
+    # fractional seconds go through fromisoformat
+    if all(len(value) == 25 and value.endswith("+00:00") or len(value) == 20 and value.endswith("Z") for value in values):
+        return np.array([value[:19] for value in values], dtype="datetime64[s]").astype(np.int64)
+    return np.array([int(parse_ts(value).timestamp()) for value in values], dtype=np.int64)
+
+class TimeEntries:
+    """Columnar batch of Toggl time entries.
+
+    Built once from the API's JSON so the ~1 KB dicts can be dropped right
+    away. Times are unix seconds, running entries have stop == -1 and entries
+    without a project have project 0. Tag i of `tags` is bit i of `tag_bits`.
+    `at` holds each entry's server-side modification time in unix seconds (0
+    when missing), newest_at the latest of them.
+    """
+
+    def __init__(self, ids, start, stop, duration, project, tag_bits, tags, deleted, at, newest_at=None):
+        self.ids = ids
+        self.start = start
+        self.stop = stop
+        self.duration = duration
+        self.project = project
+        self.tag_bits = tag_bits
+        self.tags = tags
+        self.deleted = deleted
+        self.at = at
+        self.newest_at = newest_at
+
+    @classmethod
+    def from_json(cls, entries):
+        ids, starts, closed, durations, projects, bits, deleted, ats = [], [], [], [], [], [], [], []
+        tag_index = {}
+        for entry in entries:
+            try:
+                entry_id = int(entry["id"])
+                entry_start = str(entry["start"])
+                entry_duration = int(entry.get("duration") or 0)
+            except Exception as ex:
+                print(f"⚠️ Couldn't read entry: {ex}")
+                continue
+            entry_bits = 0
+            for tag in entry.get("tags") or ():
+                entry_bits |= 1 << tag_index.setdefault(tag, len(tag_index))
+            ids.append(entry_id)
+            starts.append(entry_start)
+            closed.append(bool(entry.get("stop")))
+            durations.append(entry_duration)
+            projects.append(entry.get("project_id") or 0)
+            bits.append(entry_bits)
+            deleted.append(bool(entry.get("server_deleted_at")))
+            ats.append(str(entry.get("at") or ""))
+
+        start = parse_timestamps(starts)
+        known = [i for i, at in enumerate(ats) if at]
+        at = np.zeros(len(ats), dtype=np.int64)
+        at[known] = parse_timestamps([ats[i] for i in known])
+        duration = np.array(durations, dtype=np.int64)
+        return cls(
+            ids=np.array(ids, dtype=np.int64),
+            start=start,
+            stop=np.where(np.array(closed, dtype=bool), start + duration, -1),
+            duration=duration,
+            project=np.array(projects, dtype=np.int32),
+            # More than 64 distinct tags no longer fit a machine word
+            tag_bits=np.array(bits, dtype=np.uint64 if len(tag_index) <= 64 else object),
+            tags=list(tag_index),
+            deleted=np.array(deleted, dtype=bool),
+            at=at,
+            newest_at=int(at[known].max()) if known else None,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, mask):
+        return TimeEntries(
+            self.ids[mask], self.start[mask], self.stop[mask], self.duration[mask],
+            self.project[mask], self.tag_bits[mask], self.tags, self.deleted[mask], self.at[mask], self.newest_at
+        )
+
+    @property
+    def closed(self):
+        return (self.stop >= 0) & ~self.deleted
+
+    def tag_names(self, bits):
+        bits = int(bits)
+        return [tag for i, tag in enumerate(self.tags) if bits >> i & 1]
+
+    def tags_json(self):
+        # One JSON list per entry, encoded once per distinct tag combination
+        encoded = {}
+        for bits in self.tag_bits.tolist():
+            if bits not in encoded:
+                encoded[bits] = json.dumps(self.tag_names(bits))
+        return [encoded[bits] for bits in self.tag_bits.tolist()]
+
+    def total_minutes(self):
+        # Whole minutes per closed entry, like summing entry by entry
+        return int((self.duration[self.closed] // 60).sum())
@@ -1,170 +1,494 @@
-import requests
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+import fcntl
+import heapq
+import json
 import os
-from collections import defaultdict
-from zoneinfo import ZoneInfo
-import hydra
-from hydra.core.global_hydra import GlobalHydra
-
-# Hydra Config
-if not GlobalHydra.instance().is_initialized():
-    hydra.initialize(config_path=".", version_base=None)
-cfg = hydra.compose(config_name="config")
+import subprocess
+import sys
+import threading
+import time
+from entry_store import LOCAL_TZ, EntryStore, current_periods, week_of
+from settings import get_settings
+from toggl_client import PRIORITY_BACKFILL, PRIORITY_TODAY, RateLimiter, TogglClient, TogglError
 
 # Constants
-TOGGL_API_TOKEN = os.getenv("TOGGL_API_TOKEN", cfg.api.token)
-WORKSPACE_ID = os.getenv("TOGGL_WORKSPACE_ID", cfg.api.workspace_id)
-BASE_URL = cfg.api.base_url
-MAX_DATE_RANGE_DAYS = cfg.settings.max_date_range_days
 DAILY_GOAL_MIN = 390
-TRACKING_START_DATE = datetime(2025, 4, 9, tzinfo=ZoneInfo("Europe/Vienna"))
+TRACKING_START_DATE = datetime(2025, 4, 9, tzinfo=LOCAL_TZ)
+BEST_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "best_history_cache.json")
+AGGREGATES_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aggregates_cache.json")
+# Held while a refresh runs, so processes never sync at the same time
+REFRESH_LOCK_PATH = AGGREGATES_CACHE_PATH + ".lock"
+# Closed days, weeks and months kept per leaderboard in best_history_cache.json
+LEADERBOARD_K = 10
+# Cached aggregates younger than this are served without revalidating
+CACHE_FRESH_S = 60
+# Longest wait of a timer check for a refresh that's syncing the store
+SYNC_WAIT_S = 5
+
+def parse_days_off(values):
+    # ISO dates or "first..last" ranges, only weekdays count against the goal
+    days = set()
+    for value in values:
+        first, _, last = str(value).partition("..")
+        first = date.fromisoformat(first)
+        last = date.fromisoformat(last) if last else first
+        days.update(first + timedelta(days=i) for i in range((last - first).days + 1))
+    return sorted(day for day in days if day.weekday() < 5)
+
+@lru_cache(maxsize=None)
+def get_days_off():
+    # Holidays and vacations from settings.days_off, excluded from the debt
+    return parse_days_off(get_settings().days_off)
+
+# Pooled client, created on first use and reused so long-running processes
+# keep their connections alive
+_client = None
+_client_lock = threading.Lock()
+
+# Local entry store, one connection per thread since sqlite connections
+# can't be shared and aggregates are also refreshed in the background
+_local = threading.local()
+
+# Last API check of the running timer, extrapolated by get_today_minutes
+_today = None
+
+# Background revalidation of the aggregates cache, at most one at a time
+_refresh_lock = threading.Lock()
+_refresh_thread = None
 
 # Helper Functions
-def iso(dt):
-    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+# These raise TogglError subclasses on failure instead of returning no entries,
+# so callers can tell "no time tracked" apart from "API unreachable". Entry
+# lists are streamed, errors surface while iterating.
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            settings = get_settings()
+            _client = TogglClient(
+                settings.api.base_url, settings.api.token, settings.max_date_range_days, limiter=get_limiter()
+            )
+        return _client
+
+def get_limiter():
+    # Paced by api.rate_per_s and api.burst; the budget itself lives in the
+    # shared state file, so any instance sees the same tokens and quota
+    api = get_settings().api
+    return RateLimiter(api.rate_per_s, api.burst)
 
-def get_headers():
+def get_time_entries(start_date, end_date, priority=PRIORITY_TODAY):
+    return get_client().iter_time_entries(start_date, end_date, priority)
+
+def get_time_entries_since(since):
+    return get_client().time_entries_since(since)
+
+def get_current_entry():
+    return get_client().current_entry()
+
+def get_store():
+    if getattr(_local, "store", None) is None:
+        _local.store = EntryStore()
+    return _local.store
+
+def sync_store(store):
+    # The first sync (or one after a gap longer than a date-range chunk)
+    # downloads the full history, afterwards only entries modified since the
+    # high-water mark are fetched. Each response becomes one columnar batch.
+    from time_entries import TimeEntries
+    hwm = store.high_water_mark()
+    now = datetime.now(timezone.utc)
+    if hwm is None or now.timestamp() - hwm > get_settings().max_date_range_days * 86400:
+        entries = get_time_entries(TRACKING_START_DATE.astimezone(timezone.utc), now, PRIORITY_BACKFILL)
+        newest = store.upsert(TimeEntries.from_json(entries), replace=True)
+        # An empty history still counts as synced
+        newest = newest or int(now.timestamp())
+    else:
+        newest = store.upsert(TimeEntries.from_json(get_time_entries_since(hwm)))
+
+    if newest is not None and (hwm is None or newest > hwm):
+        store.commit_sync(newest)
+
+def get_quota_headroom():
+    # Read from the shared state, without creating a client
+    return get_limiter().headroom()
+
+def total_minutes(entries):
+    # Closed entries carry their length in seconds, no timestamps to parse
+    from time_entries import TimeEntries
+    if not isinstance(entries, TimeEntries):
+        entries = TimeEntries.from_json(entries)
+    return entries.total_minutes()
+
+def timer_state():
+    # When the running timer (if any) started, for get_today_minutes to
+    # extrapolate. Saved with the aggregates as data["timer"].
+    periods = current_periods()
+    current = get_current_entry()
+    running_id = running_since = None
+    if current and current.get("start") and not current.get("stop"):
+        running_id = current.get("id")
+        running_since = datetime.fromisoformat(current["start"].replace("Z", "+00:00")).timestamp()
     return {
-        "Content-Type": "application/json",
-        "User-Agent": "Toggl Productivity Tracker/1.0"
+        "midnight": periods["midnight"],
+        "next_midnight": periods["next_midnight"],
+        "running_id": running_id,
+        "running_since": running_since,
+        "checked_at": time.time(),
     }
 
-def get_time_entries(start_date, end_date):
-    if (end_date - start_date).days > MAX_DATE_RANGE_DAYS:
-        return get_time_entries_chunked(start_date, end_date)
+def check_today():
+    # Syncs the store first, unless a refresh still holds it after
+    # SYNC_WAIT_S; its sync lands in the store all the same
+    with refresh_lock(SYNC_WAIT_S) as locked:
+        if locked:
+            sync_store(get_store())
+    return timer_state()
 
-    url = f"{BASE_URL}/me/time_entries"
-    params = {
-        "start_date": iso(start_date),
-        "end_date": iso(end_date)
-    }
+def extrapolate_today(closed, state, now):
+    # Closed minutes plus the running timer's part of today. Entries that
+    # started yesterday count with their part after midnight.
+    if not state or state.get("running_since") is None:
+        return closed
+    midnight = state["midnight"] if now < state["next_midnight"] else current_periods(now)["midnight"]
+    return closed + int((now - max(state["running_since"], midnight)) / 60)
+
+def get_today_minutes(max_age_s=0, timer=None):
+    """Today's minutes including the running timer.
+
+    Closed minutes come from the local store. The running timer is checked
+    with the API once, or taken from timer (the state a refresh saved), and
+    then extrapolated locally. It is re-checked after max_age_s, at
+    midnight, when the store's running entry no longer matches it (a
+    webhook stopped or started one), and when the extrapolation reaches the
+    daily goal, since a timer stopped in the meantime would otherwise show a
+    goal that isn't met.
+    """
+    global _today
+    store = get_store()
+    state = _today
+    if timer and (state is None or timer["checked_at"] > state["checked_at"]):
+        state = _today = timer
+    now = time.time()
+    closed = store.minutes_on_day(current_periods(now)["today"])
+    if (
+        state is None
+        or now - state["checked_at"] >= max_age_s
+        or now >= state["next_midnight"]
+        or store.running_entry() != state.get("running_id")
+        or extrapolate_today(closed, state, state["checked_at"]) < DAILY_GOAL_MIN <= extrapolate_today(closed, state, now)
+    ):
+        state = _today = check_today()
+        now = state["checked_at"]
+        closed = store.minutes_on_day(current_periods(now)["today"])
+    return extrapolate_today(closed, state, now)
+
+def week_days(week):
+    # First day of an ISO week key and the first day after it
+    year, number = week.split("-W")
+    monday = date.fromisocalendar(int(year), int(number), 1)
+    return monday.isoformat(), (monday + timedelta(days=7)).isoformat()
+
+def load_best_cache():
     try:
-        r = requests.get(url, params=params, auth=(TOGGL_API_TOKEN, 'api_token'), headers=get_headers(), timeout=30)
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.RequestException as e:
-        print(f"\u26a0\ufe0f API request failed: {str(e)}")
-        return []
-
-def get_time_entries_chunked(start_date, end_date):
-    entries = []
-    current_start = start_date
-    while current_start < end_date:
-        current_end = min(current_start + timedelta(days=MAX_DATE_RANGE_DAYS), end_date)
-        chunk = get_time_entries(current_start, current_end)
-        entries.extend(chunk)
-        current_start = current_end + timedelta(seconds=1)
-    return entries
+        with open(BEST_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-def total_minutes(entries):
-    total = 0
-    for e in entries:
-        if e.get("stop") and e.get("start"):
-            try:
-                start = datetime.fromisoformat(e["start"].replace("Z", "+00:00"))
-                stop = datetime.fromisoformat(e["stop"].replace("Z", "+00:00"))
-                total += int((stop - start).total_seconds() / 60)
-            except Exception as ex:
-                print(f"\u26a0\ufe0f Couldn't process entry: {ex}")
-    return total
-
-def get_best_from_start():
-    end_date = datetime.now(ZoneInfo("Europe/Vienna"))
-    entries = get_time_entries(TRACKING_START_DATE.astimezone(ZoneInfo("UTC")), end_date.astimezone(ZoneInfo("UTC")))
-
-    if not entries:
-        return (None, 0), (None, 0)
-
-    by_day = defaultdict(int)
-    by_week = defaultdict(int)
-
-    for entry in entries:
-        if not entry.get("stop") or not entry.get("start"):
-            continue
-        try:
-            start = datetime.fromisoformat(entry["start"].replace("Z", "+00:00")).astimezone(ZoneInfo("Europe/Vienna"))
-            stop = datetime.fromisoformat(entry["stop"].replace("Z", "+00:00")).astimezone(ZoneInfo("Europe/Vienna"))
-            duration = int((stop - start).total_seconds() / 60)
-            
-            # Group by day
-            day_key = start.date().isoformat()
-            by_day[day_key] += duration
-
-            # Group by ISO week
-            year, week, _ = start.isocalendar()
-            week_key = f"{year}-W{week:02}"
-            by_week[week_key] += duration
-
-        except Exception as ex:
-            print(f"\u26a0\ufe0f Entry parsing error: {ex}")
-            continue
-
-    best_day_key = max(by_day, key=by_day.get, default=None)
-    best_week_key = max(by_week, key=by_week.get, default=None)
-
-    best_day = (best_day_key, int(by_day.get(best_day_key, 0)))
-    best_week = (best_week_key, int(by_week.get(best_week_key, 0)))
-
-    # Debug print
-    print("\U0001F4CA Top 5 weeks:")
-    for week, minutes in sorted(by_week.items(), key=lambda x: x[1], reverse=True)[:5]:
-        print(f"{week}: {minutes//60}h {minutes%60}m")
+def save_best_cache(cache):
+    tmp_path = BEST_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, BEST_CACHE_PATH)
 
-    return best_day, best_week
+def push_top(heap, key, minutes, k=LEADERBOARD_K):
+    # Bounded min-heap of [minutes, key], the smallest of the top k on top
+    if any(entry[1] == key for entry in heap):
+        return
+    if len(heap) < k:
+        heapq.heappush(heap, [minutes, key])
+    elif minutes > heap[0][0]:
+        heapq.heapreplace(heap, [minutes, key])
 
-def get_productivity_data():
-    local_tz = ZoneInfo("Europe/Vienna")
-    now_local = datetime.now(local_tz)
+def ranked(heap, k, live=()):
+    # Largest first, with the still-open periods compared on the fly
+    entries = {key: minutes for minutes, key in heap}
+    for key, minutes in live:
+        if minutes > entries.get(key, 0):
+            entries[key] = minutes
+    return [(key, int(minutes)) for key, minutes in heapq.nlargest(k, entries.items(), key=lambda item: item[1])]
+
+def usable_heaps(cache, start_keys):
+    # Files from before the heaps (or one of them) existed, malformed ones
+    # and heaps that ranked periods before the start date (seeded from the
+    # old best_day/best_week cache) are rebuilt from the store
+    try:
+        datetime.fromisoformat(cache["cached_at"])
+        return all(
+            isinstance(minutes, (int, float)) and key >= start_keys[name]
+            for name in start_keys for minutes, key in cache[name]
+        )
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def update_leaderboard(store):
+    """Folds the periods that closed since the last run into the top-k heaps.
+
+    best_history_cache.json keeps the LEADERBOARD_K best closed days, weeks
+    and months plus cached_at, the start of the first day not yet folded in.
+    Only periods from TRACKING_START_DATE on are ranked; without usable
+    heaps they're built from the whole store. The file is replaced
+    atomically, so a crash mid-write leaves the previous one.
+    """
+    periods = current_periods()
+    today_key = periods["today"]
+    start_day = TRACKING_START_DATE.date().isoformat()
+    start_keys = {"top_days": start_day, "top_weeks": week_of(start_day), "top_months": start_day[:7]}
+
+    cache = load_best_cache()
+    if usable_heaps(cache, start_keys):
+        cached_at = datetime.fromisoformat(cache["cached_at"])
+        if cached_at.tzinfo is None:
+            cached_at = cached_at.replace(tzinfo=LOCAL_TZ)
+        cached_at = cached_at.astimezone(LOCAL_TZ)
+        first_day = cached_at.date().isoformat()
+        first_week = week_of(first_day)
+        first_month = first_day[:7]
+        if first_day >= today_key:
+            return cache
+    else:
+        first_day, first_week, first_month = start_keys.values()
+        cache = {"top_days": [], "top_weeks": [], "top_months": []}
 
-    start_of_today = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_today = start_of_today + timedelta(days=1)
-    start_of_yesterday = start_of_today - timedelta(days=1)
-    end_of_yesterday = start_of_today
-    start_of_this_week = start_of_today - timedelta(days=start_of_today.weekday())
-    end_of_this_week = start_of_this_week + timedelta(days=7)
-    start_of_last_week = start_of_this_week - timedelta(days=7)
-    end_of_last_week = start_of_this_week
+    for key, minutes in store.top_days(LEADERBOARD_K, first_day, today_key):
+        push_top(cache["top_days"], key, minutes)
+    for key, minutes in store.top_weeks(LEADERBOARD_K, first_week, periods["this_week"]):
+        push_top(cache["top_weeks"], key, minutes)
+    for key, minutes in store.top_months(LEADERBOARD_K, first_month, periods["this_month"]):
+        push_top(cache["top_months"], key, minutes)
+    cache["cached_at"] = datetime.fromtimestamp(periods["midnight"], LOCAL_TZ).isoformat()
+    save_best_cache(cache)
+    return cache
 
-    def utc(dt): return dt.astimezone(ZoneInfo("UTC"))
+def get_leaderboard(k=5, store=None):
+    """Best k days, weeks and months as (key, minutes), largest first.
 
-    results = {
+    Closed periods come from the persisted heaps, so k is capped at
+    LEADERBOARD_K. Today, this week and this month count as they stand.
+    """
+    store = store or get_store()
+    cache = update_leaderboard(store)
+    periods = current_periods()
+    today, this_week = periods["today"], periods["this_week"]
+    return {
+        "days": ranked(cache["top_days"], k, [(today, store.minutes_on_day(today))]),
+        "weeks": ranked(cache["top_weeks"], k, [(this_week, store.minutes_in_week(this_week))]),
+        "months": ranked(cache["top_months"], k, store.top_months(1, periods["this_month"])),
+    }
+
+def get_best_from_start(store=None):
+    # Best day and week, closed periods from the leaderboard heaps
+    leaderboard = get_leaderboard(1, store)
+    best_day = leaderboard["days"][0] if leaderboard["days"] else (None, 0)
+    best_week = leaderboard["weeks"][0] if leaderboard["weeks"] else (None, 0)
+    return best_day, best_week
+
+def empty_productivity_data():
+    return {
         "today": 0,
         "yesterday": 0,
         "this_week": 0,
         "last_week": 0,
         "best_day": ("No data", 0),
-        "best_week": ("No data", 0)
+        "best_week": ("No data", 0),
+        "total": 0,
+        "breakdowns": {}
     }
 
-    try:
-        results["today"] = int(total_minutes(get_time_entries(utc(start_of_today), utc(end_of_today))))
-        results["yesterday"] = int(total_minutes(get_time_entries(utc(start_of_yesterday), utc(end_of_yesterday))))
-        results["this_week"] = int(total_minutes(get_time_entries(utc(start_of_this_week), utc(now_local))))
-        results["last_week"] = int(total_minutes(get_time_entries(utc(start_of_last_week), utc(end_of_last_week))))
+def get_breakdowns(store, periods, best_week_key=None):
+    # Minutes per project id and per tag from the store's rollup tables, so
+    # a stacked bar is a lookup instead of an API call
+    this_week = periods["this_week"]
+    breakdowns = {
+        "today": {"projects": store.project_minutes(periods["today"], periods["tomorrow"])},
+        "this_week": {"projects": store.project_minutes(*week_days(this_week)), "tags": store.tag_minutes(this_week)},
+    }
+    if best_week_key:
+        breakdowns["best_week"] = {"projects": store.project_minutes(*week_days(best_week_key)), "tags": store.tag_minutes(best_week_key)}
+    return breakdowns
 
-        best_day, best_week = get_best_from_start()
-        results["best_day"] = best_day if best_day[0] else ("No data", 0)
-        results["best_week"] = best_week if best_week[0] else ("No data", 0)
+def fetch_productivity_data():
+    # Raises on any failure, so a result is only ever a complete one. One
+    # incremental sync, every aggregate is then answered by the local store.
+    store = get_store()
+    sync_store(store)
+    data = store_productivity_data(store)
+    data["timer"] = timer_state()
+    return data
 
+def store_productivity_data(store):
+    # The aggregates as the local store has them, without asking the API
+    periods = current_periods()
+
+    results = empty_productivity_data()
+    results["today"] = store.minutes_on_day(periods["today"])
+    results["yesterday"] = store.minutes_on_day(periods["yesterday"])
+    results["this_week"] = store.minutes_in_week(periods["this_week"])
+    results["last_week"] = store.minutes_in_week(periods["last_week"])
+    results["total"] = store.minutes_since(TRACKING_START_DATE)
+
+    best_day, best_week = get_best_from_start(store)
+    results["best_day"] = best_day if best_day[0] else ("No data", 0)
+    results["best_week"] = best_week if best_week[0] else ("No data", 0)
+    results["breakdowns"] = get_breakdowns(store, periods, best_week[0])
+    return results
+
+def get_productivity_data():
+    try:
+        return fetch_productivity_data()
+    except TogglError:
+        raise
     except Exception as e:
         print(f"\u26a0\ufe0f Error in productivity calculation: {str(e)}")
+        return empty_productivity_data()
 
-    return results
+# Stale-while-revalidate cache of the aggregates in aggregates_cache.json:
+# the last good result is served right away and refreshed in the background,
+# so a slow or unreachable API never blanks the dashboard
+def load_aggregates():
+    # A missing, partial or old-format cache is a miss
+    try:
+        with open(AGGREGATES_CACHE_PATH) as f:
+            cache = json.load(f)
+        data = cache["data"]
+        fetched_at = float(cache["fetched_at"])
+        if not set(empty_productivity_data()) <= set(data):
+            return None
+        data["best_day"] = tuple(data["best_day"])
+        data["best_week"] = tuple(data["best_week"])
+        # JSON turned the project ids into strings
+        data["breakdowns"] = data.get("breakdowns") or {}
+        for breakdown in data["breakdowns"].values():
+            breakdown["projects"] = {int(project): minutes for project, minutes in breakdown["projects"].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return data, fetched_at
 
-def get_total_debt():
-    now = datetime.now(ZoneInfo("Europe/Vienna"))
-    start = TRACKING_START_DATE
+def save_aggregates(data, fetched_at=None):
+    # fetched_at is when the store last synced with the API, now by default
+    tmp_path = AGGREGATES_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"data": data, "fetched_at": fetched_at or time.time()}, f)
+    os.replace(tmp_path, AGGREGATES_CACHE_PATH)
 
-    total_weekdays = sum(
-        1 for i in range((now.date() - start.date()).days + 1)
-        if (start + timedelta(days=i)).weekday() < 5
+def refresh_aggregates():
+    started = time.monotonic()
+    data = fetch_productivity_data()
+    save_aggregates(data)
+    log_refresh(time.monotonic() - started)
+    return data
+
+def log_refresh(elapsed_s):
+    # One line per refresh, so the quota headroom can be followed in the log
+    headroom = get_quota_headroom()
+    quota = "unknown" if headroom["quota_remaining"] is None else (
+        f"{headroom['quota_remaining']} left, resets in {headroom['quota_resets_in_s']}s"
     )
+    print(f"[{time.ctime()}] Aggregates refreshed in {elapsed_s:.2f}s, quota {quota}, {headroom['tokens']} tokens.")
+
+@contextmanager
+def refresh_lock(wait_s=0):
+    # Held while the store syncs, by any thread or process; yields whether
+    # it was acquired within wait_s
+    with open(REFRESH_LOCK_PATH, "a") as f:
+        deadline = time.monotonic() + wait_s
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(0.1)
+        yield True
+
+def refresh_exclusive():
+    # Skipped when another thread or process is already refreshing
+    with refresh_lock() as locked:
+        return refresh_aggregates() if locked else None
+
+def refresh_in_background():
+    try:
+        refresh_exclusive()
+    except Exception as e:
+        print(f"\u26a0\ufe0f Background refresh failed, serving cached aggregates: {str(e)}")
+
+def start_refresh():
+    global _refresh_thread
+    with _refresh_lock:
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=refresh_in_background, daemon=True)
+            _refresh_thread.start()
+        return _refresh_thread
+
+def start_detached_refresh():
+    # Refreshes in a child process that outlives a one-shot run, the next
+    # run picks up the cache it writes
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stdin=subprocess.DEVNULL, start_new_session=True
+    )
+
+def get_cached_productivity_data(wait_s=0, fresh_s=CACHE_FRESH_S, detached=False):
+    """Returns the last good aggregates and when they were fetched (unix seconds).
+
+    A cache older than fresh_s triggers a background refresh, which is
+    waited on for at most wait_s, or with detached=True runs in its own
+    process and isn't waited on at all. Only without any cache does the call
+    block on the API, and then TogglError propagates as with
+    get_productivity_data.
+    """
+    cached = load_aggregates()
+    if cached is None:
+        return refresh_aggregates(), time.time()
+
+    if time.time() - cached[1] > fresh_s:
+        if detached:
+            start_detached_refresh()
+            return cached
+        thread = start_refresh()
+        thread.join(wait_s)
+        if not thread.is_alive():
+            cached = load_aggregates() or cached
+    return cached
+
+def count_weekdays(first, last):
+    # Mon-Fri in [first, last]: five per full week, plus the weekdays among
+    # the remaining days, which start on first's weekday and may wrap once
+    if last < first:
+        return 0
+    weeks, rest = divmod((last - first).days + 1, 7)
+    start = first.weekday()
+    return weeks * 5 + max(0, min(start + rest, 5) - start) + max(0, start + rest - 7)
+
+def count_working_days(first, last):
+    return count_weekdays(first, last) - (bisect_right(get_days_off(), last) - bisect_left(get_days_off(), first))
 
-    required_minutes = total_weekdays * DAILY_GOAL_MIN
-    actual_minutes = total_minutes(get_time_entries(
-        start.astimezone(ZoneInfo("UTC")),
-        now.astimezone(ZoneInfo("UTC"))
-    ))
+def get_total_debt(actual_minutes=None):
+    today = datetime.now(LOCAL_TZ).date()
+    required_minutes = count_working_days(TRACKING_START_DATE.date(), today) * DAILY_GOAL_MIN
+    # Callers that already have the "total" aggregate pass it in to skip the sync
+    if actual_minutes is None:
+        store = get_store()
+        sync_store(store)
+        actual_minutes = store.minutes_since(TRACKING_START_DATE)
 
     return required_minutes - actual_minutes
 
+if __name__ == "__main__":
+    # Entry point of start_detached_refresh
+    refresh_in_background()
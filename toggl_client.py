@@ -0,0 +1,373 @@
+import fcntl
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from queue import Full, Queue
+
+class TogglError(Exception):
+    """Base class for Toggl API failures."""
+
+class TogglAuthError(TogglError):
+    """The API token was rejected."""
+
+class TogglRateLimited(TogglError):
+    """Still rate limited after all retries."""
+
+class TogglUnavailable(TogglError):
+    """Network error or 5xx response after all retries."""
+
+# Request priorities: "today" calls keep the dashboard current, "backfill"
+# calls download history and yield whenever the shared budget runs low
+PRIORITY_TODAY = "today"
+PRIORITY_BACKFILL = "backfill"
+
+RATE_LIMIT_STATE_PATH = os.getenv(
+    "TOGGL_RATE_LIMIT_STATE", os.path.join(tempfile.gettempdir(), "toggl_rate_limit.json")
+)
+
+# Response bodies are decoded in pieces of this size. Download threads hand
+# decoded entries over in batches, at most STREAM_QUEUE_SIZE of them wait.
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_BATCH_SIZE = 250
+STREAM_QUEUE_SIZE = 8
+# Most time entries /me/time_entries returns per request, newest first
+PAGE_SIZE = 1000
+
+CHUNK_DONE = object()
+
+def iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def iter_json_array(chunks):
+    """Yields the items of a top-level JSON array while its text arrives.
+
+    Only the undecoded tail is buffered. Items are objects, whose truncated
+    text never decodes, so an item split across chunks is simply retried
+    once more text is in.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"expected a JSON array, got {buffer[pos:pos + 20]!r}")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                break
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+    raise ValueError("JSON array ended early")
+
+class RateLimiter:
+    """Token bucket shared by every process that uses the same state file.
+
+    The dashboard and side scripts share one API token, so the bucket and the
+    last quota reported by Toggl (X-Toggl-Quota-Remaining/-Resets-In) live in
+    a small JSON file guarded by flock. Backfill requests leave a reserve of
+    tokens and quota for "today" requests.
+    """
+
+    def __init__(self, rate_per_s=1.0, burst=4, reserve_tokens=1, reserve_quota=10, path=RATE_LIMIT_STATE_PATH):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.reserve_tokens = reserve_tokens
+        self.reserve_quota = reserve_quota
+        self.path = path
+
+    def update_state(self, fn):
+        # Runs fn(state, now) under an exclusive lock and writes the state back
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                now = time.time()
+                tokens = state.get("tokens", self.burst)
+                updated = state.get("updated", now)
+                state["tokens"] = min(self.burst, tokens + (now - updated) * self.rate_per_s)
+                state["updated"] = now
+                if state.get("quota_resets_at") and state["quota_resets_at"] <= now:
+                    state["quota_remaining"] = state["quota_resets_at"] = None
+
+                result = fn(state, now)
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                # Flushed while still locked, or the next reader sees a stale
+                # or half-written file
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_acquire(self, priority):
+        # Returns 0 when a request may go out now, otherwise the seconds to wait
+        backfill = priority == PRIORITY_BACKFILL
+        reserve_tokens = self.reserve_tokens if backfill else 0
+        reserve_quota = self.reserve_quota if backfill else 0
+
+        def take(state, now):
+            remaining = state.get("quota_remaining")
+            if remaining is not None and remaining <= reserve_quota:
+                return state["quota_resets_at"] - now
+            if state["tokens"] < 1 + reserve_tokens:
+                return (1 + reserve_tokens - state["tokens"]) / self.rate_per_s
+            state["tokens"] -= 1
+            if remaining is not None:
+                state["quota_remaining"] = remaining - 1
+            return 0
+
+        return self.update_state(take)
+
+    def acquire(self, priority=PRIORITY_TODAY, max_wait_s=60):
+        waited = 0
+        while True:
+            wait = self.try_acquire(priority)
+            if wait <= 0:
+                return
+            if waited + wait > max_wait_s:
+                raise TogglRateLimited(f"request budget exhausted for {priority} calls, next slot in {wait:.0f}s")
+            time.sleep(wait)
+            waited += wait
+
+    def observe(self, status, headers):
+        # Toggl reports the remaining hourly quota on every response; a 429
+        # additionally drains the bucket so every consumer backs off
+        remaining = headers.get("X-Toggl-Quota-Remaining")
+        resets_in = headers.get("X-Toggl-Quota-Resets-In")
+
+        def record(state, now):
+            if remaining is not None and remaining.isdigit():
+                state["quota_remaining"] = int(remaining)
+                state["quota_resets_at"] = now + int(resets_in) if resets_in and resets_in.isdigit() else now + 3600
+            if status == 429:
+                state["tokens"] = 0
+
+        self.update_state(record)
+
+    def headroom(self):
+        def read(state, now):
+            resets_at = state.get("quota_resets_at")
+            return {
+                "tokens": round(state["tokens"], 2),
+                "quota_remaining": state.get("quota_remaining"),
+                "quota_resets_in_s": int(resets_at - now) if resets_at else None,
+            }
+        return self.update_state(read)
+
+class TogglClient:
+    """Toggl v9 client on a pooled keep-alive session with retry and backoff."""
+
+    def __init__(self, base_url, token, max_date_range_days, max_workers=4, max_retries=4, backoff_s=0.5, timeout_s=30, limiter=None, page_size=PAGE_SIZE):
+        self.base_url = base_url
+        self.page_size = page_size
+        self.limiter = limiter or RateLimiter()
+        self.max_date_range_days = max_date_range_days
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.timeout_s = timeout_s
+
+        # requests is imported with the first client, not with the module
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.request_errors = requests.exceptions.RequestException
+        self.session = requests.Session()
+        self.session.auth = (token, 'api_token')
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "User-Agent": "Toggl Productivity Tracker/1.0"
+        })
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(max_workers, 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, path, params=None, priority=PRIORITY_TODAY, stream=False):
+        # GET with rate limiting and retries, returns the successful response
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            self.limiter.acquire(priority)
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout_s, stream=stream)
+            except self.request_errors as e:
+                error = TogglUnavailable(str(e))
+            else:
+                self.limiter.observe(r.status_code, r.headers)
+                if r.ok:
+                    return r
+                # Reading the short error body also releases a streamed connection
+                detail = r.text[:200]
+                if r.status_code == 402:
+                    # Hourly quota used up, retrying before the reset is pointless
+                    raise TogglRateLimited(f"402 quota exceeded for {path}, resets in {r.headers.get('X-Toggl-Quota-Resets-In', '?')}s")
+                elif r.status_code == 429:
+                    error = TogglRateLimited(f"429 Too Many Requests for {path}")
+                    retry_after = r.headers.get("Retry-After")
+                elif r.status_code >= 500:
+                    error = TogglUnavailable(f"{r.status_code} {r.reason} for {path}")
+                elif r.status_code in (401, 403):
+                    raise TogglAuthError(f"{r.status_code} {r.reason} for {path}")
+                else:
+                    raise TogglError(f"{r.status_code} {r.reason} for {path}: {detail}")
+
+            if attempt == self.max_retries:
+                raise error
+            # Honour Retry-After, otherwise exponential backoff with full jitter
+            if retry_after and retry_after.isdigit():
+                delay = int(retry_after)
+            else:
+                delay = random.uniform(0, self.backoff_s * 2 ** attempt)
+            print(f"⚠️ {error}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def get(self, path, params=None, priority=PRIORITY_TODAY):
+        return self.request(path, params, priority).json()
+
+    def stream(self, path, params=None, priority=PRIORITY_TODAY):
+        # Items of a JSON array response, decoded as the body arrives so the
+        # whole document never has to sit in memory
+        r = self.request(path, params, priority, stream=True)
+        r.encoding = "utf-8"
+        with r:
+            try:
+                yield from iter_json_array(r.iter_content(STREAM_CHUNK_BYTES, decode_unicode=True))
+            except self.request_errors as e:
+                raise TogglUnavailable(f"{path} broke off mid-response: {e}")
+            except ValueError as e:
+                raise TogglError(f"Malformed response for {path}: {e}")
+
+    def date_chunks(self, start_date, end_date):
+        # The API caps the date range per request
+        chunks = []
+        current_start = start_date
+        while current_start < end_date:
+            current_end = min(current_start + timedelta(days=self.max_date_range_days), end_date)
+            chunks.append((current_start, current_end))
+            current_start = current_end + timedelta(seconds=1)
+        return chunks
+
+    def time_entries(self, start_date, end_date, priority=PRIORITY_TODAY):
+        return list(self.iter_time_entries(start_date, end_date, priority))
+
+    def iter_time_entries(self, start_date, end_date, priority=PRIORITY_TODAY):
+        # Longer ranges are split into chunks that download concurrently on a
+        # small bounded pool (429s are still retried per chunk). Entries are
+        # yielded as they are decoded, de-duplicated by entry id.
+        seen = set()
+        for entry in self.iter_chunks(self.date_chunks(start_date, end_date), priority):
+            if entry["id"] not in seen:
+                seen.add(entry["id"])
+                yield entry
+
+    def iter_chunks(self, chunks, priority):
+        if len(chunks) <= 1 or self.max_workers <= 1:
+            for chunk in chunks:
+                yield from self.time_entries_chunk(*chunk, priority)
+            return
+
+        # Workers hand entries over through a bounded queue, so memory stays
+        # flat however long the history is. Stopping early cancels them.
+        queue = Queue(STREAM_QUEUE_SIZE)
+        cancelled = threading.Event()
+
+        def put(item):
+            while not cancelled.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def pump(chunk):
+            try:
+                batch = []
+                for entry in self.time_entries_chunk(*chunk, priority):
+                    batch.append(entry)
+                    if len(batch) == STREAM_BATCH_SIZE:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch:
+                    put(batch)
+            except Exception as e:
+                put(e)
+            finally:
+                put(CHUNK_DONE)
+
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks)))
+        try:
+            for chunk in chunks:
+                pool.submit(pump, chunk)
+            remaining = len(chunks)
+            while remaining:
+                item = queue.get()
+                if item is CHUNK_DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            cancelled.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def pages(self, path, params, priority=PRIORITY_TODAY):
+        # A full page is continued with `before` one second past its oldest
+        # start, so entries sharing that second come again and are skipped
+        seen = set()
+        before = None
+        while True:
+            count = 0
+            oldest = None
+            for entry in self.stream(path, dict(params, before=iso(before)) if before else params, priority):
+                count += 1
+                start = datetime.fromisoformat(entry["start"].replace("Z", "+00:00"))
+                oldest = start if oldest is None else min(oldest, start)
+                if entry["id"] not in seen:
+                    seen.add(entry["id"])
+                    yield entry
+            if count < self.page_size:
+                return
+            next_before = oldest.replace(microsecond=0) + timedelta(seconds=1)
+            if before is not None and next_before >= before:
+                raise TogglError(f"More than {self.page_size} entries start at {iso(oldest)}, can't page past them")
+            before = next_before
+
+    def time_entries_chunk(self, start_date, end_date, priority=PRIORITY_TODAY):
+        return self.pages("/me/time_entries", {
+            "start_date": iso(start_date),
+            "end_date": iso(end_date)
+        }, priority)
+
+    def time_entries_since(self, since, priority=PRIORITY_TODAY):
+        # Entries created, updated or deleted since the given unix timestamp
+        return self.pages("/me/time_entries", {"since": since}, priority)
+
+    def current_entry(self):
+        return self.get("/me/time_entries/current")
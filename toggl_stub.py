@@ -0,0 +1,168 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the Toggl v9 API, serving a generated history so the
+# client can be exercised and timed offline
+
+# Entries per /me/time_entries response, like the API
+PAGE_SIZE = 1000
+
+def ts(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+def make_entries(days=365, per_day=6, seed=0, end=None):
+    # A few entries per day between 08:00 and 20:00 UTC with realistic fields
+    rng = random.Random(seed)
+    end = end or datetime.now(timezone.utc).replace(microsecond=0)
+    entries = []
+    entry_id = 1_000_000
+    for day in range(days, 0, -1):
+        day_start = (end - timedelta(days=day)).replace(hour=8, minute=0, second=0)
+        cursor = day_start
+        for _ in range(rng.randint(0, per_day)):
+            start = cursor + timedelta(minutes=rng.randint(0, 60))
+            duration = rng.randint(10 * 60, 150 * 60)
+            stop = start + timedelta(seconds=duration)
+            cursor = stop
+            entry_id += 1
+            project_id = rng.choice([None, 201, 202, 203])
+            tags = rng.sample(["deep", "admin", "meeting", "review"], rng.randint(0, 2))
+            entries.append({
+                "id": entry_id,
+                "workspace_id": 1,
+                "project_id": project_id,
+                "task_id": None,
+                "billable": False,
+                "start": ts(start),
+                "stop": ts(stop),
+                "duration": duration,
+                "description": f"Entry {entry_id}",
+                "tags": tags,
+                "tag_ids": [],
+                "duronly": True,
+                "at": ts(stop + timedelta(seconds=30)),
+                "server_deleted_at": None,
+                "user_id": 1,
+                "uid": 1,
+                "wid": 1,
+                "pid": project_id,
+            })
+    return entries
+
+def parse_param(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with server.lock:
+            server.requests += 1
+            request_number = server.requests
+            if server.quota is not None:
+                server.quota -= 1
+            quota = server.quota
+        if server.latency_s:
+            time.sleep(server.latency_s)
+
+        # Rate limiting like the real API: every fail_every-th request is
+        # throttled, and the hourly quota ends in 402 once used up
+        if server.fail_every and request_number % server.fail_every == 0:
+            return self.send_json({"error": "Too Many Requests"}, 429, {"Retry-After": "1"})
+        if quota is not None and quota < 0:
+            return self.send_json("Quota exceeded", 402, quota_headers(0))
+        headers = quota_headers(quota) if quota is not None else {}
+
+        if url.path.endswith("/me/time_entries/current"):
+            return self.send_json(None, headers=headers)
+        if not url.path.endswith("/me/time_entries"):
+            return self.send_json({"error": "not found"}, 404)
+
+        # Newest first, like the API
+        if "since" in params:
+            since = int(params["since"])
+            body = [e for start, at, e in server.index if at >= since]
+        else:
+            start = parse_param(params["start_date"]).timestamp()
+            end = parse_param(params["end_date"]).timestamp()
+            if server.max_range_days and end - start > server.max_range_days * 86400:
+                return self.send_json(f"Maximum allowed date range is {server.max_range_days} days", 400, headers)
+            body = [e for entry_start, at, e in server.index if start <= entry_start < end]
+        if "before" in params:
+            before = parse_param(params["before"]).timestamp()
+            body = [e for e in body if parse_param(e["start"]).timestamp() < before]
+        if server.page_size:
+            body = body[:server.page_size]
+        self.send_json(body, headers=headers)
+
+    def send_json(self, body, status=200, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def quota_headers(remaining):
+    return {"X-Toggl-Quota-Remaining": str(max(remaining, 0)), "X-Toggl-Quota-Resets-In": "3600"}
+
+def serve(entries, latency_s=0.0, host="127.0.0.1", port=0, max_range_days=None, fail_every=0, quota=None, page_size=PAGE_SIZE):
+    """Starts the stub on a background thread, its base URL is server.base_url.
+
+    max_range_days rejects wider start/end ranges with a 400 like the API,
+    fail_every answers every n-th request with a 429 and quota counts down
+    X-Toggl-Quota-Remaining until requests fail with 402. Responses hold at
+    most page_size entries, the rest is fetched with `before`.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.entries = entries
+    # (start, at, entry) newest first, so requests don't re-parse timestamps
+    server.index = sorted(
+        ((parse_param(e["start"]).timestamp(), parse_param(e["at"]).timestamp(), e) for e in entries),
+        key=lambda row: row[0], reverse=True
+    )
+    server.latency_s = latency_s
+    server.max_range_days = max_range_days
+    server.fail_every = fail_every
+    server.quota = quota
+    server.page_size = page_size
+    server.requests = 0
+    server.lock = threading.Lock()
+    server.base_url = f"http://{host}:{server.server_port}/api/v9"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a generated Toggl history locally.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--max-range-days", type=int, default=None, help="reject wider start/end ranges with a 400")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every n-th request with a 429")
+    parser.add_argument("--quota", type=int, default=None, help="requests until the hourly quota runs out")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="most entries per response")
+    args = parser.parse_args()
+
+    server = serve(make_entries(args.days), args.latency, port=args.port, max_range_days=args.max_range_days,
+                   fail_every=args.fail_every, quota=args.quota, page_size=args.page_size)
+    print(f"Toggl stub serving {len(server.entries)} entries at {server.base_url}")
+    print(f"Point the dashboard at it with TOGGL_BASE_URL={server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -416,7 +416,6 @@ class EPD:
             Width = self.width // 8
         else:
             Width = self.width // 8 +1
-        Height = self.height
 
         Xend -= 1
         Yend -= 1
@@ -439,11 +438,11 @@ class EPD:
         self.send_data(Ystart & 0xff)
         self.send_data((Ystart>>8) & 0x01)
 
+        # Slice the window out of the frame row by row and send it in one transfer
+        frame = memoryview(bytearray(Image))
+        window = b''.join(frame[j * Width + Xstart : j * Width + Xend + 1] for j in range(Ystart, Yend + 1))
         self.send_command(0x24)  
-        for j in range(Height):
-            for i in range(Width):
-                if((j > Ystart-1) & (j < (Yend + 1)) & (i > Xstart-1) & (i < (Xend + 1))):
-                    self.send_data(Image[i + j * Width])
+        self.send_data2(window)
         self.TurnOnDisplay_Part()
     
     def display_4Gray(self, image):
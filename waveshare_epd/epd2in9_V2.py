@@ -188,8 +188,7 @@ class EPD:
 
     def lut(self, lut):
         self.send_command(0x32)
-        for i in range(0, 153):
-            self.send_data(lut[i])
+        self.send_data2(lut[0:153])
         self.ReadBusy()
 
     def SetLut(self, lut):
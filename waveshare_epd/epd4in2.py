@@ -42,6 +42,9 @@ GRAY2 = 0xC0
 GRAY3 = 0x80  # gray
 GRAY4 = 0x00  # Blackest
 
+# Byte translation table that flips every bit
+INVERT = bytes(0xFF - i for i in range(256))
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,7 +60,7 @@ class EPD:
         self.GRAY2 = GRAY2
         self.GRAY3 = GRAY3  # gray
         self.GRAY4 = GRAY4  # Blackest
-        self.DATA = [0x00] * 15000
+        self.DATA = bytearray(15000)
 
     lut_vcom0 = [
         0x00, 0x08, 0x08, 0x00, 0x00, 0x02,
@@ -533,8 +536,6 @@ class EPD:
         else:
             X_end = int(X_end / 8)
 
-        buf = [0x00] * (Y_end - Y_start) * (X_end - X_start)
-
         self.send_command(0x91)  # This command makes the display enter partial mode
         self.send_command(0x90)  # resolution setting
         self.send_data(int(X_start * 8 / 256))
@@ -550,18 +551,20 @@ class EPD:
         self.send_data(int(Y_end % 256) - 1)  # y-end
         self.send_data(0x28)
 
+        # Slice the window rows out of the old and new frames in one pass each
+        rows = [((Y_start + j) * Width + X_start, (Y_start + j) * Width + X_end) for j in range(0, Y_end - Y_start)]
+        frame = memoryview(bytearray(Image))
+        old = b''.join(self.DATA[a:b] for a, b in rows)
+        new = b''.join(frame[a:b] for a, b in rows).translate(INVERT)
+
         self.send_command(0x10)  # writes Old data to SRAM for programming
-        for j in range(0, Y_end - Y_start):
-            for i in range(0, X_end - X_start):
-                buf[j * (X_end - X_start) + i] = self.DATA[(Y_start + j) * Width + X_start + i]
-        self.send_data2(buf)
+        self.send_data2(old)
 
         self.send_command(0x13)  # writes New data to SRAM.
-        for j in range(0, Y_end - Y_start):
-            for i in range(0, X_end - X_start):
-                buf[j * (X_end - X_start) + i] = ~Image[(Y_start + j) * Width + X_start + i]
-                self.DATA[(Y_start + j) * Width + X_start + i] = ~Image[(Y_start + j) * Width + X_start / 8 + i]
-        self.send_data2(buf)
+        window = X_end - X_start
+        for j, (a, b) in enumerate(rows):
+            self.DATA[a:b] = new[j * window:(j + 1) * window]
+        self.send_data2(new)
 
         self.send_command(0x12)  # DISPLAY REFRESH
         epdconfig.delay_ms(200)  # The delay here is necessary, 200uS at least!!!
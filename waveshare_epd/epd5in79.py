@@ -518,6 +518,11 @@ class EPD:
         Width =int(self.width / 16)+1
         Width1 =int(self.width / 8)
         Height = self.height
+        # Each controller drives half of the panel; gather its columns from every row up front
+        frame = memoryview(bytearray(Image))
+        master = b''.join(frame[i * Width1 : i * Width1 + Width] for i in range(Height))
+        slave = b''.join(frame[i * Width1 + Width - 1 : i * Width1 + Width * 2 - 1] for i in range(Height))
+
         self.send_command(0x44)	 
         self.send_data(0x00)     						
         self.send_data(0x31) 
@@ -534,8 +539,7 @@ class EPD:
         self.send_data(0x01) 	
 
         self.send_command(0x24)
-        for i in range(Height):
-            self.send_data2(Image[i * Width1 : i * Width1+Width])
+        self.send_data2(master)
 
         self.send_command(0xC4)		    # Set Ram X- address Start / End position
         self.send_data(0x31)     		# XStart, POR = 00h
@@ -553,8 +557,7 @@ class EPD:
         self.send_data(0x01)
 
         self.send_command(0xA4)
-        for i in range(Height):
-            self.send_data2(Image[i * Width1 + Width - 1 : i * Width1 + Width * 2 - 1])
+        self.send_data2(slave)
 
         self.TurnOnDisplay_Partial()
 
@@ -40,14 +40,20 @@ GRAY2  = 0xC0
 GRAY3  = 0x80 #gray
 GRAY4  = 0x00 #Blackest
 
+# Byte translation table that flips every bit
+INVERT = bytes(0xFF - i for i in range(256))
+
 logger = logging.getLogger(__name__)
 
 class EPD:
-    def __init__(self):
-        self.reset_pin = epdconfig.RST_PIN
-        self.dc_pin = epdconfig.DC_PIN
-        self.busy_pin = epdconfig.BUSY_PIN
-        self.cs_pin = epdconfig.CS_PIN
+    # config defaults to the module-level epdconfig; pass an epdconfig.RaspberryPi
+    # instance to drive a panel on other pins or another SPI device
+    def __init__(self, config=None):
+        self.config = config or epdconfig
+        self.reset_pin = self.config.RST_PIN
+        self.dc_pin = self.config.DC_PIN
+        self.busy_pin = self.config.BUSY_PIN
+        self.cs_pin = self.config.CS_PIN
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
         self.GRAY1  = GRAY1 #white
@@ -57,43 +63,45 @@ class EPD:
     
     # Hardware reset
     def reset(self):
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20) 
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(2)
-        epdconfig.digital_write(self.reset_pin, 1)
-        epdconfig.delay_ms(20)   
+        self.config.digital_write(self.reset_pin, 1)
+        self.config.delay_ms(20) 
+        self.config.digital_write(self.reset_pin, 0)
+        self.config.delay_ms(2)
+        self.config.digital_write(self.reset_pin, 1)
+        self.config.delay_ms(20)   
 
     def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
+        self.config.digital_write(self.dc_pin, 0)
+        self.config.digital_write(self.cs_pin, 0)
+        self.config.spi_writebyte([command])
+        self.config.digital_write(self.cs_pin, 1)
 
     def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
+        self.config.digital_write(self.dc_pin, 1)
+        self.config.digital_write(self.cs_pin, 0)
+        self.config.spi_writebyte([data])
+        self.config.digital_write(self.cs_pin, 1)
 
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.SPI.writebytes2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        self.config.digital_write(self.dc_pin, 1)
+        self.config.digital_write(self.cs_pin, 0)
+        self.config.SPI.writebytes2(data)
+        self.config.digital_write(self.cs_pin, 1)
 
     def ReadBusy(self):
         logger.debug("e-Paper busy")
         self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
+        busy = self.config.digital_read(self.busy_pin)
         while(busy == 0):
+            # Yield while polling so other panels can transfer in the meantime
+            self.config.delay_ms(5)
             self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
-        epdconfig.delay_ms(20)
+            busy = self.config.digital_read(self.busy_pin)
+        self.config.delay_ms(20)
         logger.debug("e-Paper busy release")
         
     def init(self):
-        if (epdconfig.module_init() != 0):
+        if (self.config.module_init() != 0):
             return -1
         # EPD hardware init start
         self.reset()
@@ -111,7 +119,7 @@ class EPD:
         self.send_data(0x17)		#VDL=-15V
 
         self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100)
+        self.config.delay_ms(100)
         self.ReadBusy()
 
         self.send_command(0X00)			#PANNEL SETTING
@@ -143,7 +151,7 @@ class EPD:
         return 0
     
     def init_fast(self):
-        if (epdconfig.module_init() != 0):
+        if (self.config.module_init() != 0):
             return -1
         # EPD hardware init start
         self.reset()
@@ -162,7 +170,7 @@ class EPD:
         # self.send_data(0x03)
 
         self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
+        self.config.delay_ms(100) 
         self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
 
         #Enhanced display drive(Add 0x06 command)
@@ -181,7 +189,7 @@ class EPD:
         return 0
     
     def init_part(self):
-        if (epdconfig.module_init() != 0):
+        if (self.config.module_init() != 0):
             return -1
         # EPD hardware init start
         self.reset()
@@ -190,7 +198,7 @@ class EPD:
         self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
 
         self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
+        self.config.delay_ms(100) 
         self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
 
         self.send_command(0xE0)
@@ -203,7 +211,7 @@ class EPD:
     
     # The feature will only be available on screens sold after 24/10/23
     def init_4Gray(self):
-        if (epdconfig.module_init() != 0):
+        if (self.config.module_init() != 0):
             return -1
         # EPD hardware init start
         self.reset()
@@ -216,7 +224,7 @@ class EPD:
         self.send_data(0x07)
 
         self.send_command(0x04) #POWER ON
-        epdconfig.delay_ms(100) 
+        self.config.delay_ms(100) 
         self.ReadBusy()        #waiting for the electronic paper IC to release the idle signal
 
         #Enhanced display drive(Add 0x06 command)
@@ -238,7 +246,9 @@ class EPD:
         img = image
         imwidth, imheight = img.size
         if(imwidth == self.width and imheight == self.height):
-            img = img.convert('1')
+            # Native orientation, nothing to rotate
+            if img.mode != '1':
+                img = img.convert('1')
         elif(imwidth == self.height and imheight == self.width):
             # image has correct dimensions, but needs to be rotated
             img = img.rotate(90, expand=True).convert('1')
@@ -247,12 +257,9 @@ class EPD:
             # return a blank buffer
             return [0x00] * (int(self.width/8) * self.height)
 
-        buf = bytearray(img.tobytes('raw'))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return bytearray(img.tobytes('raw')).translate(INVERT)
     
     def getbuffer_4Gray(self, image):
         # logger.debug("bufsiz = ",int(self.width/8) * self.height)
@@ -291,15 +298,8 @@ class EPD:
         return buf
 
     def display(self, image):
-        if(self.width % 8 == 0):
-            Width = self.width // 8
-        else:
-            Width = self.width // 8 +1
-        Height = self.height
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~image[i + j * Width]
+        # The old-data RAM gets the inverted frame
+        image1 = bytes(image).translate(INVERT)
         self.send_command(0x10)
         self.send_data2(image1)
 
@@ -307,7 +307,7 @@ class EPD:
         self.send_data2(image)
 
         self.send_command(0x12)
-        epdconfig.delay_ms(100)
+        self.config.delay_ms(100)
         self.ReadBusy()
 
     def Clear(self):
@@ -317,19 +317,15 @@ class EPD:
         self.send_data2([0x00] * int(self.width * self.height / 8))
 
         self.send_command(0x12)
-        epdconfig.delay_ms(100)
+        self.config.delay_ms(100)
         self.ReadBusy()
 
     def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
-        if((Xstart % 8 + Xend % 8 == 8 & Xstart % 8 > Xend % 8) | Xstart % 8 + Xend % 8 == 0 | (Xend - Xstart)%8 == 0):
-            Xstart = Xstart // 8 * 8
-            Xend = Xend // 8 * 8
-        else:
-            Xstart = Xstart // 8 * 8
-            if Xend % 8 == 0:
-                Xend = Xend // 8 * 8
-            else:
-                Xend = Xend // 8 * 8 + 1
+        # Image is the window's own buffer, (Xend - Xstart) // 8 bytes per
+        # row once X is aligned to whole bytes, as in Waveshare's examples
+        Xstart = Xstart // 8 * 8
+        if Xend % 8 != 0:
+            Xend = Xend // 8 * 8 + 8
                 
         Width = (Xend - Xstart) // 8
         Height = Yend - Ystart
@@ -353,18 +349,26 @@ class EPD:
         self.send_data ((Yend-1)%256)  #y-end
         self.send_data (0x01)
 
-        image1 = [0xFF] * int(self.width * self.height / 8)
-        for j in range(Height):
-                for i in range(Width):
-                    image1[i + j * Width] = ~Image[i + j * Width]
+        image1 = bytes(Image[:Width * Height]).translate(INVERT)
 
         self.send_command(0x13)   #Write Black and White image to RAM
         self.send_data2(image1)
 
         self.send_command(0x12)
-        epdconfig.delay_ms(100)
+        self.config.delay_ms(100)
         self.ReadBusy()
 
+    def display_Partial_frame(self, Image, Xstart, Ystart, Xend, Yend):
+        # Same as display_Partial, but Image is a full-frame buffer (getbuffer)
+        # that the window is sliced out of row by row
+        Xstart = Xstart // 8 * 8
+        if Xend % 8 != 0:
+            Xend = Xend // 8 * 8 + 8
+        Width = self.width // 8
+        frame = memoryview(bytearray(Image))
+        window = b''.join(frame[j * Width + Xstart // 8 : j * Width + Xend // 8] for j in range(Ystart, Yend))
+        self.display_Partial(window, Xstart, Ystart, Xend, Yend)
+
     def display_4Gray(self, image):
         self.send_command(0x10)
         for i in range(0, 48000):     
@@ -431,7 +435,18 @@ class EPD:
             self.send_data(temp3)
         
         self.send_command(0x12)
-        epdconfig.delay_ms(100)
+        self.config.delay_ms(100)
+        self.ReadBusy()
+
+    # Power the panel down between updates without entering deep sleep,
+    # so the register settings survive and power_on() is enough to wake it
+    def power_off(self):
+        self.send_command(0x02) # POWER_OFF
+        self.ReadBusy()
+
+    def power_on(self):
+        self.send_command(0x04) # POWER_ON
+        self.config.delay_ms(100)
         self.ReadBusy()
 
     def sleep(self):
@@ -444,6 +459,6 @@ class EPD:
         self.send_command(0x07) # DEEP_SLEEP
         self.send_data(0XA5)
         
-        epdconfig.delay_ms(2000)
-        epdconfig.module_exit()
+        self.config.delay_ms(2000)
+        self.config.module_exit()
 ### END OF FILE ###
@@ -48,9 +48,18 @@ class RaspberryPi:
     MOSI_PIN = 10
     SCLK_PIN = 11
 
-    def __init__(self):
+    # Pins and SPI device can be overridden to run several panels side by side,
+    # each on its own chip-select line (spi_device 0 -> CE0, 1 -> CE1)
+    def __init__(self, rst_pin=None, dc_pin=None, busy_pin=None, pwr_pin=None, spi_bus=0, spi_device=0):
         import spidev
         import gpiozero
+
+        self.RST_PIN = rst_pin if rst_pin is not None else self.RST_PIN
+        self.DC_PIN = dc_pin if dc_pin is not None else self.DC_PIN
+        self.BUSY_PIN = busy_pin if busy_pin is not None else self.BUSY_PIN
+        self.PWR_PIN = pwr_pin if pwr_pin is not None else self.PWR_PIN
+        self.spi_bus = spi_bus
+        self.spi_device = spi_device
         
         self.SPI = spidev.SpiDev()
         self.GPIO_RST_PIN    = gpiozero.LED(self.RST_PIN)
@@ -139,8 +148,8 @@ class RaspberryPi:
             self.DEV_SPI.DEV_Module_Init()
 
         else:
-            # SPI device, bus = 0, device = 0
-            self.SPI.open(0, 0)
+            # SPI device, bus = 0, device = 0 unless overridden
+            self.SPI.open(self.spi_bus, self.spi_device)
             self.SPI.max_speed_hz = 4000000
             self.SPI.mode = 0b00
         return 0
@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import toggl
+from entry_store import LOCAL_TZ, current_periods, parse_ts
+
+# Receiver for Toggl webhook events on time entries. Created, updated and
+# deleted entries go straight into the local store, so the dashboard only
+# has to poll the API as a safety net for missed events.
+
+SIGNATURE_HEADER = "X-Webhook-Signature-256"
+MAX_BODY_BYTES = 1024 * 1024
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def verify_signature(secret, body, signature):
+    return bool(signature) and hmac.compare_digest(sign(secret, body), signature)
+
+def today_aggregates(store):
+    # Everything the dashboard shows about today
+    periods = current_periods()
+    return store.minutes_on_day(periods["today"]), store.project_minutes(periods["today"], periods["tomorrow"])
+
+def apply_event(store, event):
+    """Upserts the time entry of a webhook event into the store.
+
+    Returns True when today's aggregates changed. Running entries are stored
+    but only count once they stop, like with a sync. Events older than what
+    the store has for the entry (its `at`, deletions included) are ignored.
+    """
+    metadata = event.get("metadata") or {}
+    entry = event.get("payload")
+    if metadata.get("model") != "time_entry" or not isinstance(entry, dict):
+        return False
+    at = entry.get("at") or event.get("timestamp") or datetime.now(LOCAL_TZ).isoformat()
+    if metadata.get("action") == "deleted":
+        # Deleted payloads may still carry the entry's last `at`
+        at = max(at, event.get("timestamp") or at, key=lambda value: parse_ts(value))
+        entry = dict(entry, server_deleted_at=entry.get("server_deleted_at") or at)
+    entry = dict(entry, at=at)
+
+    # Deliveries can arrive out of order, an older state of the entry than
+    # the stored one is dropped
+    stored_at = store.entry_at(entry.get("id"))
+    if stored_at is not None and parse_ts(at).timestamp() < stored_at:
+        return False
+
+    before = today_aggregates(store)
+    store.upsert([entry])
+    return today_aggregates(store) != before
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0, one delivery per connection, so a client holding a
+    # connection open can't stall the single handler thread
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self.send_json({"error": "payload too large"}, 413)
+        body = self.rfile.read(length)
+        if not verify_signature(self.server.secret, body, self.headers.get(SIGNATURE_HEADER)):
+            return self.send_json({"error": "bad signature"}, 401)
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return self.send_json({"error": "malformed JSON"}, 400)
+
+        # Toggl validates a new subscription by having its code echoed back
+        if event.get("payload") == "ping":
+            return self.send_json({"validation_code": event.get("validation_code")})
+
+        try:
+            changed = apply_event(toggl.get_store(), event)
+        except Exception as e:
+            # Toggl retries failed deliveries
+            print(f"⚠️ Couldn't apply webhook event {event.get('event_id')}: {e}")
+            return self.send_json({"error": "not applied"}, 500)
+        self.send_json({})
+        if changed and self.server.on_change:
+            self.server.on_change()
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(secret, on_change=None, host="0.0.0.0", port=8088):
+    """Starts the receiver on a background thread.
+
+    Events are applied one at a time on that thread, with its own store
+    connection. on_change() is called after an event changed today's
+    aggregates.
+    """
+    if not secret:
+        raise ValueError("a webhook secret is required to verify Toggl's signatures")
+    server = HTTPServer((host, port), WebhookHandler)
+    server.secret = secret
+    server.on_change = on_change
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
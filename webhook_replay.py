@@ -0,0 +1,80 @@
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+import requests
+import toggl_stub
+from webhook import SIGNATURE_HEADER, sign
+
+# Replays Toggl webhook deliveries against a local receiver: a validation
+# ping, then signed created/updated/deleted events for generated entries
+
+def event(action, entry, event_id):
+    return {
+        "event_id": event_id,
+        "created_at": entry["at"],
+        "creator_id": entry["user_id"],
+        "metadata": {
+            "action": action,
+            "event_user_id": entry["user_id"],
+            "model": "time_entry",
+            "path": f"/api/v9/workspaces/{entry['workspace_id']}/time_entries/{entry['id']}",
+            "workspace_id": entry["workspace_id"],
+        },
+        "payload": entry,
+        "subscription_id": 1,
+        "timestamp": entry["at"],
+    }
+
+def make_events(days=2, seed=0):
+    # Every generated entry is created, then a third of them get longer and
+    # a tenth are deleted again
+    entries = toggl_stub.make_entries(days, seed=seed, end=datetime.now(timezone.utc) + timedelta(days=1))
+    events = [event("created", entry, i) for i, entry in enumerate(entries)]
+    latest = {entry["id"]: entry for entry in entries}
+    for entry in entries[::3]:
+        stop = datetime.fromisoformat(entry["stop"]) + timedelta(minutes=15)
+        updated = dict(entry, stop=toggl_stub.ts(stop), duration=entry["duration"] + 900, at=toggl_stub.ts(stop + timedelta(seconds=30)))
+        latest[entry["id"]] = updated
+        events.append(event("updated", updated, len(events)))
+    for entry in entries[::10]:
+        # Each change moves the entry's `at` on
+        deleted_at = datetime.fromisoformat(latest[entry["id"]]["at"]) + timedelta(minutes=1)
+        events.append(event("deleted", dict(latest[entry["id"]], at=toggl_stub.ts(deleted_at)), len(events)))
+    return events
+
+def post(url, secret, payload):
+    body = json.dumps(payload).encode()
+    return requests.post(url, data=body, headers={"Content-Type": "application/json", SIGNATURE_HEADER: sign(secret, body)})
+
+def replay(url, secret, events, delay_s=0.0):
+    # Returns the status code of every delivery, the ping's first
+    r = post(url, secret, {"payload": "ping", "validation_code": "replay"})
+    if r.ok and r.json().get("validation_code") != "replay":
+        print("⚠️ Receiver didn't echo the validation code")
+    statuses = [r.status_code]
+    for payload in events:
+        statuses.append(post(url, secret, payload).status_code)
+        if delay_s:
+            time.sleep(delay_s)
+    return statuses
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="POST signed Toggl webhook events to a local receiver.")
+    parser.add_argument("--url", default="http://127.0.0.1:8088/")
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--events", help="JSONL file of recorded events, generated ones otherwise")
+    parser.add_argument("--days", type=int, default=2, help="days of generated entries, ending today")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between deliveries")
+    args = parser.parse_args()
+
+    if args.events:
+        with open(args.events) as f:
+            events = [json.loads(line) for line in f if line.strip()]
+    else:
+        events = make_events(args.days)
+    started = time.perf_counter()
+    statuses = replay(args.url, args.secret, events, args.delay)
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for status in statuses if status != 200)
+    print(f"Replayed {len(statuses)} deliveries in {elapsed:.2f}s, {failed} failed")